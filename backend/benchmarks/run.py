@@ -0,0 +1,436 @@
+# run.py
+# Benchmark both pipelines on synthetic swing clips.
+#
+#   cd backend && python -m benchmarks.run --out bench.json
+#   python -m benchmarks.run --out new.json --compare bench.json
+#
+# Each benchmark runs in a fresh process so its peak RSS is its own.
+# Results are keyed by clip name and benchmark name, so files from
+# different commits can be compared key by key.
+
+import os
+import sys
+import json
+import time
+import resource
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+NON_ML_DIR = BACKEND_DIR / "non_ml"
+MODEL_PATH = BACKEND_DIR / "ml_model" / "model_weights" / "best.pt"
+
+# non_ml modules import each other as top-level packages (motion, geometry, ...)
+for d in (BACKEND_DIR, NON_ML_DIR):
+    if str(d) not in sys.path:
+        sys.path.append(str(d))
+
+from benchmarks.synthetic import SwingClip
+
+# (width, height, fps)
+CLIPS = [(640, 360, 30), (1280, 720, 30), (1280, 720, 60), (1920, 1080, 30),
+         (3840, 2160, 30)]
+QUICK_CLIPS = [(640, 360, 30)]
+
+WARMUP_FRAMES = 5
+
+
+def _rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def latency_stats(samples_s):
+    """Per-call latency summary in milliseconds"""
+    if not samples_s:
+        return {"calls": 0}
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "calls": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+class Timer:
+    """Collects perf_counter durations of the timed calls only"""
+
+    def __init__(self):
+        self.samples = []
+        self.n = 0
+
+    def __call__(self, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        dt = time.perf_counter() - t0
+        self.n += 1
+        if self.n > WARMUP_FRAMES:
+            self.samples.append(dt)
+        return out
+
+    def result(self):
+        total = sum(self.samples)
+        return {
+            "fps": round(len(self.samples) / total, 2) if total > 0 else None,
+            "latency": latency_stats(self.samples),
+        }
+
+
+def _motion_inputs(clip):
+    """(frame, gray, fg) per frame, the way BatTracker builds them"""
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+    prev = None
+    for frame in clip.frames():
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if prev is not None:
+            diff = cv2.absdiff(prev, gray)
+            _, fg = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+            fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, kernel)
+            yield frame, gray, fg
+        prev = gray
+
+
+# ----------------------------------------------------------
+#   BENCHMARKS: fn(clip) -> dict
+# ----------------------------------------------------------
+def bench_fuse_edges_and_motion(clip):
+    from motion.edge_fusion import fuse_edges_and_motion
+    timer = Timer()
+    for frame, gray, fg in _motion_inputs(clip):
+        timer(fuse_edges_and_motion, frame, gray, fg)
+    return timer.result()
+
+
+def bench_edge_motion_fuser(clip):
+    from motion.edge_fusion import EdgeMotionFuser
+    fuser = EdgeMotionFuser()
+    timer = Timer()
+    for frame, gray, fg in _motion_inputs(clip):
+        timer(fuser.fuse, frame, gray, fg)
+    return timer.result()
+
+
+def bench_filter_long_contours(clip):
+    from motion.edge_fusion import EdgeMotionFuser
+    from geometry.contour_filter import filter_long_contours
+    fuser = EdgeMotionFuser()
+    timer = Timer()
+    n_contours = 0
+    for frame, gray, fg in _motion_inputs(clip):
+        combined, _ = fuser.fuse(frame, gray, fg)
+        contours, _ = cv2.findContours(combined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        n_contours += len(contours)
+        timer(filter_long_contours, contours)
+    res = timer.result()
+    res["contours"] = n_contours
+    return res
+
+
+def bench_optical_flow(clip):
+    from tracking.optical_flow import PatchOpticalFlow
+    flow = PatchOpticalFlow()
+    timer = Timer()
+    reinits = 0
+    for i, frame in enumerate(clip.frames()):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if flow.prev_pts is None:
+            flow.init(gray, clip.truth[i])
+            reinits += 1
+            continue
+        timer(flow.step, gray)
+    res = timer.result()
+    res["reinits"] = reinits
+    return res
+
+
+def _bench_decode(clip, **options):
+    from utils.video_io import VideoSource
+    with tempfile.TemporaryDirectory() as tmp:
+        video = VideoSource(clip.write(Path(tmp) / "clip.mp4"), **options)
+        timer = Timer()
+        frames = iter(video)
+        while timer(next, frames, None) is not None:
+            pass
+        video.close()
+
+    res = timer.result()
+    # stride skips frames: this is how fast the clip itself gets through
+    if res["fps"]:
+        res["source_fps"] = round(res["fps"] * video.stride, 2)
+    res["decoded"] = f"{video.width}x{video.height}"
+    return res
+
+
+def bench_decode_opencv(clip):
+    return _bench_decode(clip, use_ffmpeg=False)
+
+
+def bench_decode_ffmpeg(clip):
+    return _bench_decode(clip, use_ffmpeg=True, buffers=4)
+
+
+def bench_decode_ffmpeg_720(clip):
+    return _bench_decode(clip, use_ffmpeg=True, max_height=720, buffers=4)
+
+
+def bench_decode_ffmpeg_stride4_360(clip):
+    return _bench_decode(clip, use_ffmpeg=True, stride=4, max_height=360, buffers=4)
+
+
+def bench_shot_segmentation(clip):
+    from utils.shots import motion_energy, find_shots
+    with tempfile.TemporaryDirectory() as tmp:
+        video = clip.write(Path(tmp) / "clip.mp4")
+        t0 = time.perf_counter()
+        frames, energy, stride, fps = motion_energy(video)
+        shots = find_shots(frames, energy, stride, fps, clip.n_frames)
+        wall = time.perf_counter() - t0
+
+    return {
+        # clip frames covered per second by the motion pass
+        "fps": round(clip.n_frames / wall, 2) if wall > 0 else None,
+        "shots": [(s["start"], s["end"]) for s in shots],
+        "frames_kept": sum(s["end"] - s["start"] for s in shots),
+    }
+
+
+def _bench_tracker(clip, **options):
+    from pipeline_non_ml import BatTracker
+    tracker = BatTracker(**options)
+    timer = Timer()
+    modes = {}
+    errors = []
+    for i, frame in enumerate(clip.frames()):
+        result = timer(tracker.process, frame)
+        modes[result["mode"]] = modes.get(result["mode"], 0) + 1
+        if result["rect"] is not None:
+            (cx, cy), _, _ = result["rect"]
+            (tx, ty), _, _ = clip.truth[i]
+            errors.append(np.hypot(cx - tx, cy - ty))
+
+    res = timer.result()
+    res["modes"] = modes
+    # Accuracy, so speedups that lose the bat show up too
+    res["found_frames"] = len(errors)
+    res["centre_error_px"] = round(float(np.median(errors)), 2) if errors else None
+    return res
+
+
+def bench_bat_tracker(clip):
+    return _bench_tracker(clip)
+
+
+def bench_bat_tracker_adaptive(clip):
+    return _bench_tracker(clip, max_interval=8)
+
+
+def bench_bat_tracker_track(clip):
+    return _bench_tracker(clip, track=True)
+
+
+def bench_bat_tracker_pyramid(clip):
+    return _bench_tracker(clip, pyramid_height=540)
+
+
+def _bench_ml(clip, backend="torch", render=True):
+    try:
+        from ml_model.inference.pipeline_ml import MLBatPipeline, weights_for_backend
+    except ImportError as e:
+        return {"skipped": str(e)}
+    weights = weights_for_backend(MODEL_PATH, backend)
+    if not weights.exists():
+        return {"skipped": f"no weights at {weights}"}
+
+    pipeline = MLBatPipeline(str(MODEL_PATH), backend)
+    with tempfile.TemporaryDirectory() as tmp:
+        video = clip.write(Path(tmp) / "clip.mp4")
+        latencies = []
+        last = [time.perf_counter()]
+
+        def progress(done, total):
+            now = time.perf_counter()
+            latencies.append(now - last[0])
+            last[0] = now
+
+        t0 = time.perf_counter()
+        result = pipeline.process_video(
+            video, Path(tmp) / "out.mp4" if render else None,
+            progress_callback=progress, batch_size=1,
+            decode_height=None if render else 720
+        )
+        wall = time.perf_counter() - t0
+
+    return {
+        "fps": round(result["total_frames"] / wall, 2) if wall > 0 else None,
+        # one progress call per frame, so this is end-to-end time per frame
+        "latency": latency_stats(latencies[WARMUP_FRAMES:]),
+        "stages": result["stages"],
+        "total_detections": result["total_detections"],
+    }
+
+
+def bench_ml_pipeline(clip):
+    return _bench_ml(clip)
+
+
+def bench_ml_pipeline_metrics_only(clip):
+    # Tracks and metrics without drawing/encoding the annotated video
+    return _bench_ml(clip, render=False)
+
+
+def bench_ml_pipeline_onnx(clip):
+    return _bench_ml(clip, "onnx")
+
+
+def bench_ml_pipeline_onnx_int8(clip):
+    return _bench_ml(clip, "onnx-int8")
+
+
+def bench_ml_pipeline_openvino(clip):
+    return _bench_ml(clip, "openvino")
+
+
+def bench_ml_pipeline_openvino_int8(clip):
+    return _bench_ml(clip, "openvino-int8")
+
+
+BENCHMARKS = {
+    "decode_opencv": bench_decode_opencv,
+    "decode_ffmpeg": bench_decode_ffmpeg,
+    "decode_ffmpeg_720": bench_decode_ffmpeg_720,
+    "decode_ffmpeg_stride4_360": bench_decode_ffmpeg_stride4_360,
+    "shot_segmentation": bench_shot_segmentation,
+    "fuse_edges_and_motion": bench_fuse_edges_and_motion,
+    "edge_motion_fuser": bench_edge_motion_fuser,
+    "filter_long_contours": bench_filter_long_contours,
+    "optical_flow": bench_optical_flow,
+    "bat_tracker": bench_bat_tracker,
+    "bat_tracker_adaptive": bench_bat_tracker_adaptive,
+    "bat_tracker_track": bench_bat_tracker_track,
+    "bat_tracker_pyramid": bench_bat_tracker_pyramid,
+    "ml_pipeline": bench_ml_pipeline,
+    "ml_pipeline_metrics_only": bench_ml_pipeline_metrics_only,
+    "ml_pipeline_onnx": bench_ml_pipeline_onnx,
+    "ml_pipeline_onnx_int8": bench_ml_pipeline_onnx_int8,
+    "ml_pipeline_openvino": bench_ml_pipeline_openvino,
+    "ml_pipeline_openvino_int8": bench_ml_pipeline_openvino_int8,
+}
+
+
+def _run_one(name, clip_args, seconds):
+    clip = SwingClip(*clip_args, seconds=seconds)
+    rss_start = _rss_mb()
+    t0 = time.perf_counter()
+    res = BENCHMARKS[name](clip)
+    res["wall_s"] = round(time.perf_counter() - t0, 3)
+    res["rss_start_mb"] = rss_start
+    res["peak_rss_mb"] = _rss_mb()
+    res["rss_growth_mb"] = round(res["peak_rss_mb"] - rss_start, 1)
+    return res
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, clips, seconds):
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads(),
+            "seconds": seconds,
+            "warmup_frames": WARMUP_FRAMES,
+        },
+        "results": {},
+    }
+
+    for clip_args in clips:
+        clip_name = "{}x{}@{}".format(*clip_args)
+        report["results"][clip_name] = {}
+        for name in names:
+            # Fresh spawned process per benchmark: no warm caches, and a
+            # forked child's ru_maxrss would start at this process's peak
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+                res = pool.submit(_run_one, name, clip_args, seconds).result()
+            report["results"][clip_name][name] = res
+            print(f"{clip_name:>16} {name:<24} "
+                  f"{res.get('fps') or res.get('skipped', '-')!s:>10} fps  "
+                  f"{res['peak_rss_mb']:>8} MB", flush=True)
+    return report
+
+
+def compare(new, old, tolerance):
+    """Print fps changes; returns the (clip, benchmark) pairs that got slower"""
+    slower = []
+    for clip_name, benches in new["results"].items():
+        for name, res in benches.items():
+            before = old.get("results", {}).get(clip_name, {}).get(name, {}).get("fps")
+            after = res.get("fps")
+            if not before or not after:
+                continue
+            change = after / before - 1
+            flag = ""
+            if change < -tolerance:
+                flag = "  <-- REGRESSION"
+                slower.append((clip_name, name))
+            print(f"{clip_name:>16} {name:<24} {before:>10} -> {after:>10} fps "
+                  f"({change:+.1%}){flag}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CricTrac pipeline benchmarks")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="run only these benchmarks")
+    parser.add_argument("--quick", action="store_true",
+                        help="one small clip, one second long")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--compare", help="earlier benchmark JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="fps drop (fraction) that counts as a regression")
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    clips = QUICK_CLIPS if args.quick else CLIPS
+    seconds = 1.0 if args.quick else args.seconds
+
+    report = run(names, clips, seconds)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"\nCompared with {args.compare} (commit {old['meta'].get('commit')}):")
+        if compare(report, old, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+
+# Bump when pipeline output changes so old entries stop matching
+CACHE_VERSION = 5
+
+RESULT_FILE = "result.json"
+
+
+class ResultCache:
+    """
+    Processed outputs keyed by content: hash of the video bytes plus
+    pipeline type, model weights hash and processing parameters.
+
+    Each entry is a directory under `root` holding the output files
+    and a result.json. Files that must not be served with the outputs
+    (kept source videos) go in the entry's directory under
+    `private_root` instead; they count towards its size and go with it.
+    Entries are evicted least-recently-used first once their total
+    size exceeds `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes, private_root=None):
+        self.root = Path(root)
+        self.private_root = Path(private_root) if private_root is not None else None
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.private_root is not None:
+            self.private_root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, video_hash, kind, params):
+        blob = json.dumps(
+            {"v": CACHE_VERSION, "video": video_hash, "kind": kind, "params": params},
+            sort_keys=True
+        )
+        return hashlib.sha256(blob.encode()).hexdigest()[:32]
+
+    def entry_dir(self, key):
+        return self.root / key
+
+    def private_dir(self, key):
+        if self.private_root is None:
+            raise RuntimeError("ResultCache has no private_root")
+        return self.private_root / key
+
+    def get(self, key):
+        path = self.entry_dir(key) / RESULT_FILE
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # mtime of result.json is the LRU clock
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        entry = self.entry_dir(key)
+        entry.mkdir(parents=True, exist_ok=True)
+
+        tmp = entry / (RESULT_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, entry / RESULT_FILE)
+
+        self.evict(keep=key)
+
+    def discard(self, key):
+        self._remove(key)
+
+    def _remove(self, key):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        if self.private_root is not None:
+            shutil.rmtree(self.private_dir(key), ignore_errors=True)
+
+    @staticmethod
+    def _size(d):
+        return sum(f.stat().st_size for f in d.rglob("*") if f.is_file())
+
+    def _entries(self):
+        entries = []
+        for d in self.root.iterdir():
+            marker = d / RESULT_FILE
+            if not d.is_dir() or not marker.exists():
+                continue  # still being produced
+            size = self._size(d)
+            if self.private_root is not None:
+                size += self._size(self.private_dir(d.name))
+            entries.append((marker.stat().st_mtime, size, d))
+        return entries
+
+    def evict(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, d in entries:
+            if total <= self.max_bytes:
+                break
+            if d.name == keep:
+                continue
+            self._remove(d.name)
+            total -= size
+            print(f"🧹 Evicted cached output {d.name}")
@@ -0,0 +1,152 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+
+from utils.profiling import Profile
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, input_path, output_name, total_frames=0):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.input_path = input_path
+        self.output_name = output_name
+        self.state = "queued"
+        self.frames_done = 0
+        self.total_frames = total_frames
+        self.result = None
+        self.cache_key = None
+        self.cached = False
+        self.render = False   # draw the overlay video in the same pass
+        self.sessions = []    # (session_id, player) pairs to file the shots under
+        self._part_progress = {}
+        self.error = None
+        self.profile = Profile()   # stage timings, see utils.profiling
+        self.created_at = time.time()
+        self.queued_at = None
+        self.started_at = None
+        self.finished_at = None
+
+    def set_progress(self, frames_done, total_frames=None, part=None):
+        if part is not None:
+            # Chunked job: each part reports its own count
+            self._part_progress[part] = frames_done
+            self.frames_done = sum(self._part_progress.values())
+            return
+
+        self.frames_done = frames_done
+        if total_frames:
+            self.total_frames = total_frames
+
+    def to_dict(self):
+        progress = None
+        if self.total_frames > 0:
+            progress = round(min(1.0, self.frames_done / self.total_frames), 4)
+
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "frames_done": self.frames_done,
+            "total_frames": self.total_frames,
+            "progress": progress,
+            "result": self.result,
+            "cached": self.cached,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs processing jobs off the request path.
+    At most `max_concurrent` jobs run at once; at most `max_queued`
+    may wait behind them, further submissions are rejected.
+    """
+
+    def __init__(self, max_concurrent=2, max_queued=16, max_history=500):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self.jobs = OrderedDict()
+        self._slots = None
+        self._tasks = set()
+
+    def queued_count(self):
+        return sum(1 for j in self.jobs.values() if j.state == "queued")
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def find_active(self, cache_key):
+        """A queued/running job producing the same cached output, if any"""
+        for job in self.jobs.values():
+            if job.cache_key == cache_key and job.state in ("queued", "running"):
+                return job
+        return None
+
+    def complete(self, job, result):
+        """Record a job answered without running (e.g. from the result cache)"""
+        job.state = "done"
+        job.result = result
+        job.cached = True
+        job.started_at = job.finished_at = time.time()
+        job.frames_done = job.total_frames
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def submit(self, job, runner):
+        """
+        Queue `job`. `runner(job)` is an async callable returning the
+        result dict; it may call job.set_progress() while it works.
+        """
+        if self.queued_count() >= self.max_queued:
+            raise QueueFullError("Too many queued jobs")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        job.queued_at = time.time()
+        self.jobs[job.id] = job
+        self._prune()
+
+        task = asyncio.create_task(self._run(job, runner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, runner):
+        async with self._slots:
+            job.state = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await runner(job)
+                job.state = "done"
+                if job.total_frames > 0:
+                    job.frames_done = max(job.frames_done, job.total_frames)
+            except Exception as e:
+                job.state = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                if job.input_path is not None and os.path.exists(job.input_path):
+                    os.remove(job.input_path)
+
+    def _prune(self):
+        # Forget the oldest finished jobs once history is full
+        while len(self.jobs) > self.max_history:
+            for job_id, job in self.jobs.items():
+                if job.state in ("done", "failed"):
+                    del self.jobs[job_id]
+                    break
+            else:
+                return
@@ -0,0 +1,161 @@
+import sys
+import json
+import time
+import asyncio
+from pathlib import Path
+
+import cv2
+import numpy as np
+from starlette.websockets import WebSocketDisconnect
+
+# non_ml modules import each other as top-level packages (motion, geometry, ...)
+NON_ML_DIR = Path(__file__).resolve().parent / "non_ml"
+if str(NON_ML_DIR) not in sys.path:
+    sys.path.append(str(NON_ML_DIR))
+
+from pipeline_non_ml import BatTracker, result_to_record
+
+
+class LiveSession:
+    """
+    Per-connection tracking state for live camera frames.
+
+    Frames are binary WebSocket messages: an encoded image (JPEG/PNG),
+    or raw BGR bytes after a {"type": "config", "raw": {"width", "height"}}
+    message. Only the newest frame is kept while one is being processed;
+    older ones are dropped, as are frames older than max_latency_ms.
+    Every dropped frame is answered with a {"type": "dropped"} message.
+    """
+
+    def __init__(self, mode, ml_pool=None, conf_threshold=0.4, max_latency_ms=150):
+        self.mode = mode
+        self.ml_pool = ml_pool
+        self.conf_threshold = conf_threshold
+        self.max_latency_ms = max_latency_ms
+        self.raw_shape = None
+        self.tracker = BatTracker() if mode == "non-ml" else None
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def configure(self, text):
+        """Apply a JSON config message; ValueError if it is malformed"""
+        try:
+            msg = json.loads(text)
+            raw = msg.get("raw")
+            if raw is not None:
+                raw_shape = (int(raw["height"]), int(raw["width"]), 3)
+                if min(raw_shape) <= 0:
+                    raise ValueError("raw width and height must be positive")
+                self.raw_shape = raw_shape
+            if "max_latency_ms" in msg:
+                self.max_latency_ms = float(msg["max_latency_ms"])
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Bad config message: {e!r}") from e
+
+    def _decode(self, data):
+        buf = np.frombuffer(data, np.uint8)
+        if self.raw_shape is not None:
+            return buf.reshape(self.raw_shape)
+        frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+        return frame
+
+    def _track(self, data):
+        frame = self._decode(data)
+        record = result_to_record(self.processed, self.tracker.process(frame))
+        record["frame_size"] = [frame.shape[1], frame.shape[0]]
+        return record
+
+    async def process(self, data):
+        if self.mode == "non-ml":
+            return await asyncio.to_thread(self._track, data)
+
+        detections = await asyncio.wrap_future(
+            self.ml_pool.submit_frame(data, self.raw_shape, self.conf_threshold)
+        )
+        return {"detections": detections}
+
+
+async def run_live_session(websocket, session):
+    """Receive frames and answer with per-frame tracking JSON until disconnect"""
+    await websocket.accept()
+    await websocket.send_json({"type": "ready", "mode": session.mode})
+
+    slot = [None]            # newest unprocessed (seq, received_at, bytes)
+    wake = asyncio.Event()
+    closed = [False]
+
+    async def receive():
+        try:
+            while True:
+                msg = await websocket.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+                if msg.get("text") is not None:
+                    try:
+                        session.configure(msg["text"])
+                    except ValueError as e:
+                        # Keep the session; the client can send a fixed config
+                        await websocket.send_json({"type": "error", "detail": str(e)})
+                elif msg.get("bytes") is not None:
+                    session.received += 1
+                    pending = slot[0]
+                    slot[0] = (session.received, time.perf_counter(), msg["bytes"])
+                    wake.set()
+                    if pending is not None:
+                        # Client is outrunning us: the newer frame replaces it
+                        session.dropped += 1
+                        await websocket.send_json({"type": "dropped", "seq": pending[0],
+                                                   "reason": "superseded",
+                                                   "dropped": session.dropped})
+        except (WebSocketDisconnect, RuntimeError):
+            pass   # socket went away mid-send
+        finally:
+            closed[0] = True
+            wake.set()
+
+    receiver = asyncio.create_task(receive())
+
+    try:
+        while True:
+            await wake.wait()
+            wake.clear()
+
+            if slot[0] is None:
+                if closed[0]:
+                    break
+                continue
+
+            seq, received_at, data = slot[0]
+            slot[0] = None
+
+            queued_ms = (time.perf_counter() - received_at) * 1000
+            if queued_ms > session.max_latency_ms:
+                # Tell the client, so it is not left waiting on this frame
+                session.dropped += 1
+                await websocket.send_json({"type": "dropped", "seq": seq, "reason": "stale",
+                                           "dropped": session.dropped})
+                continue
+
+            try:
+                result = await session.process(data)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": str(e)})
+                continue
+
+            session.processed += 1
+            result.update({
+                "type": "result",
+                "seq": seq,
+                "latency_ms": round((time.perf_counter() - received_at) * 1000, 2),
+                "queued_ms": round(queued_ms, 2),
+                "dropped": session.dropped,
+            })
+            await websocket.send_json(result)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
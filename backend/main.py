@@ -1,13 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, WebSocket, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
 
-import shutil
 import os
-import subprocess
+import json
+import time
+import shutil
+import asyncio
+from functools import lru_cache, partial
 from pathlib import Path
 
+from cache import ResultCache
+from session_store import SessionStore
+from jobs import Job, JobManager, QueueFullError
+from live import LiveSession, run_live_session
+from upload_stream import UploadError, receive_video
+from ml_model.inference.worker_pool import MLWorkerPool
+from utils.video_io import probe_video, concat_videos, H264_PRESETS
+from utils.chunking import (
+    plan_chunks, merge_ml_chunk_results, merge_ml_shot_results, remove_parts
+)
+from utils.common import file_sha256
+from utils.tracks import trajectory_to_array, save_tracks, load_tracks, to_columns
+from utils.profiling import StageMetrics, render_gauge
+from utils.render import render_tracks
+from utils.shots import segment_shots, whole_video_shot, shots_array
+
 app = FastAPI(title="CricTrac Bat Tracking API", version="1.0")
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -21,6 +40,72 @@ UPLOAD_DIR = BASE_DIR / "uploads"
 OUTPUT_DIR.mkdir(exist_ok=True)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Shot history (SQLite); kept out of OUTPUT_DIR, which is served
+DB_PATH = Path(os.environ.get("CRICTRAC_DB", BASE_DIR / "data" / "crictrac.db"))
+DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+MODEL_PATH = BASE_DIR / "ml_model" / "model_weights" / "best.pt"
+
+# torch | onnx | onnx-int8 | openvino | openvino-int8
+# (exported with ml_model/training/export_model.py)
+ML_BACKEND = os.environ.get("CRICTRAC_ML_BACKEND", "torch")
+
+ALLOWED_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm"}
+MAX_UPLOAD_BYTES = int(os.environ.get("CRICTRAC_MAX_UPLOAD_MB", 1024)) * 1024 * 1024
+
+ML_CONF_THRESHOLD = 0.4
+
+# x264 preset for output videos (ultrafast ... veryslow)
+ENCODE_PRESET = os.environ.get("CRICTRAC_ENCODE_PRESET", "fast")
+if ENCODE_PRESET not in H264_PRESETS:
+    # Fail at startup, not in every job's writer
+    raise ValueError(f"CRICTRAC_ENCODE_PRESET must be one of {', '.join(H264_PRESETS)}, "
+                     f"got {ENCODE_PRESET!r}")
+
+# Frames per YOLO forward pass for uploads (1 = stream frame by frame)
+ML_BATCH_SIZE = int(os.environ.get("CRICTRAC_ML_BATCH", 8))
+
+# Metrics-only ML jobs decode taller videos at this height; YOLO shrinks
+# frames to its input size anyway (0 = full resolution)
+ML_DECODE_HEIGHT = int(os.environ.get("CRICTRAC_ML_DECODE_HEIGHT", 720))
+
+# Adaptive detection: run the full detector only every 1..N frames
+# depending on motion, following the bat with optical flow in between
+# (1 = detect on every frame)
+MAX_DETECT_INTERVAL = int(os.environ.get("CRICTRAC_MAX_DETECT_INTERVAL", 1))
+
+# Non-ML uploads follow the bat with optical flow between detections
+# (BatTracker track mode) instead of detecting on every frame. Off by
+# default: it only skips detection on slow frames and its state does
+# not survive chunking's warm-up exactly
+NON_ML_TRACK = os.environ.get("CRICTRAC_NON_ML_TRACK", "0") == "1"
+
+# Non-ML whole-frame searches on taller frames (e.g. 4K phone uploads)
+# run at this height and are refined at full resolution (0 = off)
+PYRAMID_HEIGHT = int(os.environ.get("CRICTRAC_PYRAMID_HEIGHT", 720))
+
+# Long session videos are cut to their high-motion shot windows by a
+# cheap motion pass and only those are tracked (see utils.shots)
+SHOT_SEGMENTATION = os.environ.get("CRICTRAC_SHOTS", "1") == "1"
+
+# Long videos are split into chunks of at least this many frames and
+# processed in parallel; chunks re-run `overlap` frames to warm up trackers
+CHUNK_MIN_FRAMES = int(os.environ.get("CRICTRAC_CHUNK_MIN_FRAMES", 600))
+ML_CHUNK_OVERLAP = 15
+NON_ML_WORKERS = int(os.environ.get("CRICTRAC_NON_ML_WORKERS", os.cpu_count() or 1))
+
+# ML worker processes reserved for live frames (at least 1)
+ML_LIVE_WORKERS = int(os.environ.get("CRICTRAC_ML_LIVE_WORKERS", 1))
+
+# Live frames older than this when their turn comes are skipped
+LIVE_MAX_LATENCY_MS = float(os.environ.get("CRICTRAC_LIVE_MAX_LATENCY_MS", 150))
+
+# Processed outputs are cached by content under OUTPUT_DIR/<key>/
+CACHE_MAX_BYTES = int(os.environ.get("CRICTRAC_CACHE_MAX_MB", 2048)) * 1024 * 1024
+
+# Write each finished job's stage timings to <dir>/<job_id>.json
+TRACE_DIR = os.environ.get("CRICTRAC_TRACE_DIR")
+
 # Serve output videos
 app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
 
@@ -35,6 +120,172 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==========================================================
+#   JOB QUEUE
+# ==========================================================
+job_manager = JobManager(
+    max_concurrent=int(os.environ.get("CRICTRAC_MAX_JOBS", 2)),
+    max_queued=int(os.environ.get("CRICTRAC_MAX_QUEUED", 16)),
+)
+
+
+def _on_ml_progress(job_id, frames_done, total_frames):
+    # Chunks of one job report as "<job_id>:<chunk>"
+    job_id, _, part = job_id.partition(":")
+    job = job_manager.get(job_id)
+    if job is None:
+        return
+    if part:
+        job.set_progress(frames_done, part=part)
+    else:
+        job.set_progress(frames_done, total_frames)
+
+# ==========================================================
+#   STAGE METRICS (/metrics)
+# ==========================================================
+stage_metrics = StageMetrics()
+job_outcomes = {}   # (kind, "done" | "failed") -> count
+
+
+def _dump_trace(job):
+    path = Path(TRACE_DIR) / f"{job.id}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "job_id": job.id,
+            "kind": job.kind,
+            "state": job.state,
+            "total_frames": job.total_frames,
+            "queued_at": job.queued_at,
+            "started_at": job.started_at,
+            "stages": job.profile.summary(),
+            "histograms": job.profile.to_dict(),
+        }, f, indent=2)
+
+
+def _profiled(runner):
+    """Fold the job's stage timings into /metrics once it finishes"""
+    async def run(job):
+        job.profile.add("queue_wait", job.started_at - job.queued_at)
+        t0 = time.perf_counter()
+        state = "failed"
+        try:
+            result = await runner(job)
+            state = "done"
+            return result
+        finally:
+            job.profile.add("job", time.perf_counter() - t0)
+            stage_metrics.merge(job.kind, job.profile)
+            job_outcomes[(job.kind, state)] = job_outcomes.get((job.kind, state), 0) + 1
+            if TRACE_DIR:
+                await asyncio.to_thread(_dump_trace, job)
+    return run
+
+# ==========================================================
+#   RESULT CACHE
+# ==========================================================
+# Sources kept for lazy rendering live outside the served OUTPUT_DIR
+result_cache = ResultCache(OUTPUT_DIR, CACHE_MAX_BYTES, private_root=UPLOAD_DIR / "kept")
+
+# Sources used to be kept inside the (served) entry directories
+for stale in OUTPUT_DIR.glob("*/source.*"):
+    stale.unlink()
+
+
+@lru_cache(maxsize=1)
+def _model_hash():
+    return file_sha256(MODEL_PATH) if MODEL_PATH.exists() else "missing"
+
+
+def _cache_params(kind):
+    """Everything besides the video bytes that changes the output"""
+    params = {"preset": ENCODE_PRESET, "max_interval": MAX_DETECT_INTERVAL,
+              "shots": SHOT_SEGMENTATION}
+    if kind == "ml":
+        params.update(conf=ML_CONF_THRESHOLD, model=_model_hash(), backend=ML_BACKEND,
+                      decode_height=ML_DECODE_HEIGHT)
+    else:
+        params.update(track=NON_ML_TRACK, pyramid_height=PYRAMID_HEIGHT)
+    return params
+
+
+def _cached(runner):
+    async def run(job):
+        try:
+            result = await runner(job)
+        except Exception:
+            await asyncio.to_thread(result_cache.discard, job.cache_key)
+            raise
+        # put() evicts, walking the whole output tree: keep it off the loop
+        await asyncio.to_thread(result_cache.put, job.cache_key, result)
+        return result
+    return run
+
+# ==========================================================
+#   SESSION HISTORY (per-shot analytics)
+# ==========================================================
+session_store = SessionStore(DB_PATH)
+
+MAX_NAME_LENGTH = 128
+
+
+def _record(job, result):
+    """File the job's shots (metrics + trajectory) under its sessions"""
+    if not job.sessions or not result.get("shots"):
+        return
+    try:
+        tracks = load_tracks(OUTPUT_DIR / result["tracks"][len("/outputs/"):])
+        for session_id, player in job.sessions:
+            session_store.add_upload(
+                session_id, player, job.cache_key, job.id, job.kind,
+                float(tracks["fps"]), result["shots"], tracks.get("trajectory")
+            )
+    except Exception as e:
+        # History is a side product: never fail the job over it
+        print(f"Warning: could not record shots of job {job.id}: {e}")
+
+
+def _recorded(runner):
+    async def run(job):
+        result = await runner(job)
+        with job.profile("record"):
+            await asyncio.to_thread(_record, job, result)
+        return result
+    return run
+
+# ==========================================================
+#   ML WORKER POOL (model loaded once per worker)
+# ==========================================================
+ml_pool = MLWorkerPool(MODEL_PATH, on_progress=_on_ml_progress, backend=ML_BACKEND,
+                       live_workers=ML_LIVE_WORKERS)
+
+
+# Why the ML pool failed to start (None while it is up); the rest of
+# the API keeps working without it
+ml_unavailable = None
+
+
+@app.on_event("startup")
+def start_ml_pool():
+    global ml_unavailable
+    try:
+        ml_pool.start()
+    except Exception as e:
+        # e.g. no weights for ML_BACKEND: a worker's model load fails
+        ml_unavailable = f"{type(e).__name__}: {e}"
+        print(f"Warning: ML tracking unavailable ({ml_unavailable})")
+        ml_pool.shutdown()
+
+
+def _require_ml():
+    if ml_unavailable is not None:
+        raise HTTPException(503, f"ML tracking unavailable: {ml_unavailable}")
+
+
+@app.on_event("shutdown")
+def stop_ml_pool():
+    ml_pool.shutdown()
+
 # ==========================================================
 #   ROOT
 # ==========================================================
@@ -44,7 +295,17 @@ def root():
         "message": "CricTrac Backend Running!",
         "endpoints": {
             "ml": "/track/ml",
-            "non_ml": "/track/non-ml"
+            "non_ml": "/track/non-ml",
+            "jobs": "/jobs/{job_id}",
+            "tracks": "/jobs/{job_id}/tracks",
+            "render": "/jobs/{job_id}/render",
+            "trace": "/jobs/{job_id}/trace",
+            "sessions": "/sessions",
+            "session_stats": "/sessions/{session_id}/stats",
+            "player_stats": "/players/{player}/stats",
+            "shot": "/shots/{shot_id}",
+            "metrics": "/metrics",
+            "live": "/ws/track/{ml|non-ml}"
         }
     }
 
@@ -53,89 +314,504 @@ def root():
 # ==========================================================
 @app.get("/health")
 def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "ml": ml_unavailable or "ready"}
+
+# ==========================================================
+#   METRICS (Prometheus text format)
+# ==========================================================
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    states = {}
+    for job in job_manager.jobs.values():
+        states[(job.kind, job.state)] = states.get((job.kind, job.state), 0) + 1
+
+    text = stage_metrics.render()
+    text += render_gauge(
+        "crictrac_jobs_finished_total", "Jobs run to completion or failure",
+        [({"pipeline": k, "state": st}, n) for (k, st), n in sorted(job_outcomes.items())],
+        kind="counter"
+    )
+    text += render_gauge(
+        "crictrac_jobs", "Jobs currently known, by state",
+        [({"pipeline": k, "state": st}, n) for (k, st), n in sorted(states.items())]
+    )
+    text += render_gauge(
+        "crictrac_ml_workers", "Resident YOLO worker processes",
+        [({}, ml_pool.num_workers)]
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
 
 # ==========================================================
-#   ML PIPELINE (SCRIPT-BASED)
+#   UPLOAD -> JOB
 # ==========================================================
-@app.post("/track/ml")
-async def track_ml(video: UploadFile = File(...)):
-    allowed = {".mp4", ".avi", ".mov", ".mkv"}
-    ext = Path(video.filename).suffix.lower()
+def _job_response(job, cached=False):
+    return {
+        "status": job.state,
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "cached": cached
+    }
+
 
-    if ext not in allowed:
-        raise HTTPException(400, "Invalid video format")
+async def _submit_job(kind, request, runner):
+    """
+    Uploads are processed to tracks and metrics only, unless the query
+    string asks for ?render=1; the annotated video can be rendered
+    later from the stored tracks (POST /jobs/{job_id}/render).
 
-    input_path = UPLOAD_DIR / video.filename
-    output_name = f"processed_ml_{video.filename}"
-    output_path = OUTPUT_DIR / output_name
+    Shots are filed under ?session=<id> (default: the job id), and
+    under ?player=<name> when given, for the /sessions and /players
+    history queries.
+    """
+    if job_manager.queued_count() >= job_manager.max_queued:
+        raise HTTPException(429, "Server busy, try again later")
 
+    job = Job(kind, None, None)
+    job.render = request.query_params.get("render", "0").lower() in ("1", "true", "yes")
+    session_id = request.query_params.get("session") or job.id
+    player = request.query_params.get("player") or None
+    if len(session_id) > MAX_NAME_LENGTH or len(player or "") > MAX_NAME_LENGTH:
+        raise HTTPException(400, f"session and player must be at most {MAX_NAME_LENGTH} characters")
+    job.sessions.append((session_id, player))
+
+    # Stream the upload straight to disk, hashing as it arrives
     try:
-        # Save upload
-        with open(input_path, "wb") as f:
-            shutil.copyfileobj(video.file, f)
-
-        # Run ML pipeline
-        cmd = [
-            "python3",
-            str(BASE_DIR / "ml_model" / "inference" / "pipeline_ml.py"),
-            str(input_path),
-            str(output_path)
-        ]
-
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-
-        if proc.returncode != 0:
-            raise HTTPException(500, proc.stderr)
-
-        return {
-            "status": "success",
-            "output_video": f"/outputs/{output_name}"
-        }
+        with job.profile("upload_save"):
+            job.input_path, _, video_hash, _ = await receive_video(
+                request, UPLOAD_DIR / job.id, ALLOWED_EXTENSIONS, MAX_UPLOAD_BYTES
+            )
+    except UploadError as e:
+        raise HTTPException(e.status, e.detail)
+
+    # Header-only probe: reject anything OpenCV can't read before queueing
+    with job.profile("probe"):
+        info = await asyncio.to_thread(probe_video, job.input_path)
+    if info is None or info["fps"] <= 0 or info["width"] <= 0 or info["height"] <= 0:
+        os.remove(job.input_path)
+        raise HTTPException(400, "Could not read video stream")
+    job.total_frames = max(0, info["frame_count"])
+
+    # ---- Same video + same settings: reuse the stored output ----
+    job.cache_key = result_cache.key(video_hash, kind, _cache_params(kind))
+
+    cached = result_cache.get(job.cache_key)
+    same = job_manager.find_active(job.cache_key) if cached is None else None
+    if cached is not None or same is not None:
+        os.remove(job.input_path)
+        stage_metrics.merge(kind, job.profile)
+        if same is not None:
+            # Recorded under this request's session too once it finishes
+            same.sessions.extend(job.sessions)
+            return _job_response(same)
+
+        await asyncio.to_thread(_record, job, cached)
+        if job.render and not cached.get("output_video") and cached.get("shots"):
+            # Tracks are cached but the video was never drawn
+            return _submit_render(job.cache_key, kind)
+        job_manager.complete(job, cached)
+        return _job_response(job, cached=True)
+
+    # Outputs are always H.264 MP4 so browsers can play them
+    job.output_name = f"{job.cache_key}/processed_{kind}.mp4"
+
+    try:
+        job_manager.submit(job, _profiled(_recorded(_cached(runner))))
+    except QueueFullError:
+        os.remove(job.input_path)
+        raise HTTPException(429, "Server busy, try again later")
+
+    return _job_response(job)
 
-    finally:
-        if input_path.exists():
-            os.remove(input_path)
+
+def _keep_source(job):
+    """
+    Move the upload into the job's private cache directory (instead of
+    letting JobManager delete it) so its video can be rendered later.
+    """
+    src = Path(job.input_path)
+    source = result_cache.private_dir(job.cache_key) / f"source{src.suffix}"
+    source.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(src), source)
+    return source
 
 # ==========================================================
-#   NON-ML PIPELINE (PLACEHOLDER / SCRIPT)
+#   LAZY RENDERING (tracks -> annotated video)
 # ==========================================================
-@app.post("/track/non-ml")
-async def track_non_ml(video: UploadFile = File(...)):
-    allowed = {".mp4", ".avi", ".mov", ".mkv"}
-    ext = Path(video.filename).suffix.lower()
-
-    if ext not in allowed:
-        raise HTTPException(400, "Invalid video format")
+def _submit_render(cache_key, kind):
+    entry = result_cache.entry_dir(cache_key)
+    tracks_path = entry / f"processed_{kind}.npz"
+    sources = sorted(result_cache.private_dir(cache_key).glob("source.*"))
+    if not sources or not tracks_path.exists():
+        raise HTTPException(410, "Source video no longer stored, upload it again with ?render=1")
 
-    input_path = UPLOAD_DIR / video.filename
-    output_name = f"processed_non_ml_{video.filename}"
-    output_path = OUTPUT_DIR / output_name
+    render_key = f"{cache_key}:render"
+    job = job_manager.find_active(render_key)
+    if job is not None:
+        return _job_response(job)
 
+    job = Job("render", None, f"{cache_key}/processed_{kind}.mp4")
+    job.cache_key = render_key
+    runner = partial(_run_render, cache_key=cache_key,
+                     source=sources[0], tracks_path=tracks_path)
     try:
-        with open(input_path, "wb") as f:
-            shutil.copyfileobj(video.file, f)
+        job_manager.submit(job, _profiled(runner))
+    except QueueFullError:
+        raise HTTPException(429, "Server busy, try again later")
+    return _job_response(job)
 
-        cmd = [
-            "python3",
-            str(BASE_DIR / "non_ml" / "pipeline_non_ml.py"),
-            str(input_path),
-            str(output_path)
-        ]
 
-        proc = subprocess.run(cmd, capture_output=True, text=True)
+async def _run_render(job, cache_key, source, tracks_path):
+    output_path = OUTPUT_DIR / job.output_name
+    await asyncio.to_thread(
+        render_tracks, source, tracks_path, output_path, ENCODE_PRESET,
+        job.set_progress, job.profile
+    )
+    # The video is what the source was kept for
+    os.remove(source)
 
-        if proc.returncode != 0:
-            raise HTTPException(500, proc.stderr)
+    url = f"/outputs/{job.output_name}"
+    result = result_cache.get(cache_key) or {}
+    result["output_video"] = url
+    await asyncio.to_thread(result_cache.put, cache_key, result)
 
-        return {
-            "status": "success",
-            "output_video": f"/outputs/{output_name}"
-        }
+    for other in job_manager.jobs.values():
+        if other.cache_key == cache_key and other.result is not None:
+            other.result["output_video"] = url
+    return result
+
+# ==========================================================
+#   ML PIPELINE (WORKER POOL)
+# ==========================================================
+async def _run_ml(job):
+    output_path = OUTPUT_DIR / job.output_name
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tracks_path = output_path.with_suffix(".npz")
+    video_out = output_path if job.render else None
+    source = job.input_path if job.render else _keep_source(job)
+    options = dict(
+        conf_threshold=ML_CONF_THRESHOLD,
+        encode_preset=ENCODE_PRESET,
+        batch_size=ML_BATCH_SIZE,
+        max_interval=MAX_DETECT_INTERVAL,
+        decode_height=ML_DECODE_HEIGHT or None
+    )
+
+    shots = None
+    if SHOT_SEGMENTATION:
+        with job.profile("segment"):
+            shots = await asyncio.to_thread(segment_shots, source)
+
+    if shots is not None:
+        # Shot windows are independent ranges: no warm-up, no stitching
+        chunks = shots
+        job.total_frames = sum(s["end"] - s["start"] for s in shots)
+    else:
+        chunks = plan_chunks(
+            job.total_frames, ml_pool.num_workers,
+            overlap=ML_CHUNK_OVERLAP, min_chunk_frames=CHUNK_MIN_FRAMES
+        )
+    render = job.render and bool(chunks)
+
+    if shots is None and len(chunks) == 1:
+        result = await asyncio.wrap_future(
+            ml_pool.submit(source, video_out, job_id=job.id,
+                           tracks_path=tracks_path, **options)
+        )
+        job.profile.merge(result["profile"])
+        result["shots"] = [whole_video_shot(result["total_frames"], result["fps"],
+                                            result["metrics"])]
+        result["best_shot"] = 0
+        timings = result["timings"]
+        stages = result["stages"]
+    else:
+        if render:
+            parts = [str(output_path.parent / f"part{c['index']}.mp4") for c in chunks]
+        else:
+            parts = [None] * len(chunks)
+        try:
+            results = await asyncio.gather(*[
+                asyncio.wrap_future(ml_pool.submit(
+                    source, part,
+                    job_id=f"{job.id}:{c['index']}",
+                    start_frame=c["start"], end_frame=c["end"],
+                    warmup_frames=c["warmup"], return_detections=True,
+                    **options
+                ))
+                for c, part in zip(chunks, parts)
+            ])
+            if render:
+                with job.profile("transcode"):
+                    await asyncio.to_thread(concat_videos, parts, output_path, ENCODE_PRESET)
+        finally:
+            if render:
+                remove_parts(parts)
+
+        for r in results:
+            job.profile.merge(r["profile"])
+        arrays = {}
+        if shots is not None:
+            if results:
+                fps = results[0]["fps"]
+            else:
+                # No shots found: nothing ran, so ask the container
+                info = await asyncio.to_thread(probe_video, source)
+                fps = info["fps"] if info is not None else 0
+            result = merge_ml_shot_results(results, shots, fps)
+            arrays["shots"] = shots_array(shots)
+        else:
+            result = merge_ml_chunk_results(results, chunks)
+            result["shots"] = [whole_video_shot(result["total_frames"], result["fps"],
+                                                result["metrics"])]
+            result["best_shot"] = 0
+        with job.profile("save_tracks"):
+            await asyncio.to_thread(
+                save_tracks, tracks_path, result["fps"],
+                detections=result["detections"],
+                trajectory=trajectory_to_array(result["trajectory"]),
+                **arrays
+            )
+        timings = [r["timings"] for r in results]
+        stages = [r["stages"] for r in results]
+
+    return {
+        "output_video": f"/outputs/{job.output_name}" if render else None,
+        "tracks": f"/outputs/{Path(job.output_name).with_suffix('.npz').as_posix()}",
+        "total_frames": result["total_frames"],
+        "total_detections": result["total_detections"],
+        "unique_bats": result["unique_bats"],
+        "frames_interpolated": result["frames_interpolated"],
+        "metrics": result["metrics"],
+        "shots": result["shots"],
+        "best_shot": result["best_shot"],
+        "chunks": len(chunks),
+        "timings": timings,
+        "stages": stages
+    }
+
+
+@app.post("/track/ml", status_code=202)
+async def track_ml(request: Request):
+    """multipart/form-data with the video in a 'video' file field; ?render=1 for the video"""
+    _require_ml()
+    return await _submit_job("ml", request, _run_ml)
+
+# ==========================================================
+#   NON-ML PIPELINE (SCRIPT)
+# ==========================================================
+# Longest stdout line read from the non-ML script
+RESULT_LINE_LIMIT = 64 * 1024 * 1024
+
+
+async def _run_non_ml(job):
+    output_path = OUTPUT_DIR / job.output_name
+    source = job.input_path if job.render else _keep_source(job)
+
+    proc = await asyncio.create_subprocess_exec(
+        "python3",
+        str(BASE_DIR / "non_ml" / "pipeline_non_ml.py"),
+        str(source),
+        str(output_path),
+        "--workers", str(NON_ML_WORKERS),
+        "--min-chunk-frames", str(CHUNK_MIN_FRAMES),
+        "--max-interval", str(MAX_DETECT_INTERVAL),
+        *(["--track"] if NON_ML_TRACK else []),
+        *(["--pyramid-height", str(PYRAMID_HEIGHT)] if PYRAMID_HEIGHT > 0 else []),
+        *(["--shots"] if SHOT_SEGMENTATION else []),
+        *([] if job.render else ["--no-video"]),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        # RESULT carries every shot's summary and stage stats (~1 KB
+        # each); asyncio's default 64 KiB line limit fails long sessions
+        limit=RESULT_LINE_LIMIT
+    )
+    stderr_task = asyncio.create_task(proc.stderr.read())
+
+    # Headless mode reports "PROGRESS <done> <total> [<chunk>]",
+    # "TOTAL <frames>" once shots are found, and a final "RESULT <json>"
+    result = None
+    async for raw in proc.stdout:
+        line = raw.decode(errors="replace").strip()
+        if line.startswith("PROGRESS "):
+            fields = line.split()[1:]
+            if len(fields) == 3:
+                job.set_progress(int(fields[0]), part=fields[2])
+            else:
+                job.set_progress(int(fields[0]), int(fields[1]))
+        elif line.startswith("TOTAL "):
+            job.total_frames = int(line.split()[1])
+        elif line.startswith("RESULT "):
+            result = json.loads(line[len("RESULT "):])
+
+    stderr = await stderr_task
+    await proc.wait()
+
+    if proc.returncode != 0 or result is None:
+        raise RuntimeError(stderr.decode(errors="replace"))
+    job.profile.merge(result.get("profile"))
+
+    frames_json = Path(job.output_name).with_suffix(".json").as_posix()
+    tracks = Path(job.output_name).with_suffix(".npz").as_posix()
 
-    finally:
-        if input_path.exists():
-            os.remove(input_path)
+    return {
+        "output_video": f"/outputs/{job.output_name}" if result["output_video"] else None,
+        "frames_json": f"/outputs/{frames_json}",
+        "tracks": f"/outputs/{tracks}",
+        "total_frames": result["total_frames"],
+        "frames_detected": result["frames_detected"],
+        "frames_tracked": result["frames_tracked"],
+        "frames_lost": result["frames_lost"],
+        "transitions": result["transitions"],
+        "metrics": result["metrics"],
+        "shots": result["shots"],
+        "best_shot": result["best_shot"],
+        "chunks": result.get("chunks", 1),
+        "stages": result["stages"]
+    }
+
+
+@app.post("/track/non-ml", status_code=202)
+async def track_non_ml(request: Request):
+    """multipart/form-data with the video in a 'video' file field; ?render=1 for the video"""
+    return await _submit_job("non_ml", request, _run_non_ml)
+
+# ==========================================================
+#   LIVE TRACKING (WEBSOCKET)
+# ==========================================================
+@app.websocket("/ws/track/{mode}")
+async def track_live(websocket: WebSocket, mode: str):
+    if mode not in ("ml", "non-ml"):
+        await websocket.close(code=1008)
+        return
+    if mode == "ml" and ml_unavailable is not None:
+        # Accept first: a close before the handshake reaches clients as a bare 403
+        await websocket.accept()
+        await websocket.send_json({"type": "error", "status": 503,
+                                   "detail": f"ML tracking unavailable: {ml_unavailable}"})
+        await websocket.close(code=1013)
+        return
+
+    session = LiveSession(mode, ml_pool, ML_CONF_THRESHOLD, LIVE_MAX_LATENCY_MS)
+    await run_live_session(websocket, session)
+
+# ==========================================================
+#   JOB STATUS
+# ==========================================================
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/tracks")
+def job_tracks(job_id: str, format: str = "npz"):
+    """Detections / per-frame tracker state as .npz, or as JSON columns"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    if job.state != "done":
+        raise HTTPException(409, f"Job is {job.state}")
+
+    url = (job.result or {}).get("tracks")
+    path = OUTPUT_DIR / url[len("/outputs/"):] if url else None
+    if path is None or not path.exists():
+        raise HTTPException(404, "Tracks not available")
+
+    if format == "json":
+        return to_columns(load_tracks(path))
+    if format != "npz":
+        raise HTTPException(400, "format must be 'npz' or 'json'")
+    return FileResponse(path, media_type="application/octet-stream",
+                        filename=f"{job.kind}_{job.id}.npz")
+
+
+@app.post("/jobs/{job_id}/render", status_code=202)
+async def job_render(job_id: str):
+    """
+    Annotated video of a finished job, drawn from its stored tracks.
+    Returns a job to poll; its result carries output_video.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    if job.state != "done":
+        raise HTTPException(409, f"Job is {job.state}")
+    if job.kind == "render" or job.result.get("output_video"):
+        return _job_response(job, cached=True)
+    if not job.result.get("shots"):
+        raise HTTPException(409, "No shots found, nothing to render")
+    return _submit_render(job.cache_key, job.kind)
+
+
+@app.get("/jobs/{job_id}/trace")
+def job_trace(job_id: str):
+    """Where this job's time went, per stage"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "state": job.state,
+        "stages": job.profile.summary(),
+    }
+
+
+# ==========================================================
+#   SESSION HISTORY
+# ==========================================================
+@app.get("/sessions")
+def list_sessions(player: str = None, limit: int = 50):
+    """Newest sessions first, with their shot count and top bat speed"""
+    return {"sessions": session_store.sessions(player, max(1, min(limit, 500)))}
+
+
+@app.get("/sessions/{session_id}")
+def session_detail(session_id: str):
+    """A session's aggregates and every shot's metrics"""
+    session = session_store.session(session_id)
+    if session is None:
+        raise HTTPException(404, "Session not found")
+    return session
+
+
+@app.get("/sessions/{session_id}/stats")
+def session_stats(session_id: str):
+    """Precomputed aggregates: shots, max / mean peak bat speed, best shot"""
+    stats = session_store.session_stats(session_id)
+    if stats is None:
+        raise HTTPException(404, "Session not found")
+    return stats
+
+
+@app.get("/players/{player}/stats")
+def player_stats(player: str):
+    """The same aggregates over all of a player's sessions"""
+    stats = session_store.player_stats(player)
+    if stats is None:
+        raise HTTPException(404, "Player not found")
+    return stats
+
+
+@app.get("/shots/{shot_id}")
+def shot_detail(shot_id: int):
+    """One shot's metrics and trajectory (JSON columns, row 0 = start_frame)"""
+    shot = session_store.shot(shot_id)
+    if shot is None:
+        raise HTTPException(404, "Shot not found")
+    traj = shot.pop("trajectory")
+    shot["trajectory"] = to_columns({"trajectory": traj})["trajectory"] if traj is not None else None
+    return shot
+
+
+@app.get("/jobs")
+def list_jobs():
+    return {
+        "running": sum(1 for j in job_manager.jobs.values() if j.state == "running"),
+        "queued": job_manager.queued_count(),
+        "jobs": [j.to_dict() for j in job_manager.jobs.values()]
+    }
 
 # ==========================================================
 #   RUN SERVER
@@ -1,130 +1,357 @@
 from ultralytics import YOLO
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+from ultralytics.engine.results import Results
+import torch
 import cv2
 import numpy as np
 import os
 import sys
-import subprocess
 from pathlib import Path
 
+# Make backend/ importable when run as a script
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from utils.video_io import make_h264_writer, batched, VideoSource, ThreadedVideoPipeline
+from utils.metrics import trajectory_from_detections, compute_swing_metrics
+from utils.tracks import (
+    DETECTION_DTYPE, ColumnBuffer, trajectory_to_array, save_tracks
+)
+from utils.profiling import Profile
+from utils.render import draw_detections
+from non_ml.tracking.optical_flow import PatchOpticalFlow
+from non_ml.tracking.adaptive import AdaptiveInterval
+
+# Inference backends: weights file or directory next to the .pt, as
+# written by ml_model/training/export_model.py. ultralytics loads each
+# through the same YOLO interface, so results look the same.
+BACKENDS = {
+    "torch": "{stem}.pt",
+    "onnx": "{stem}.onnx",
+    "onnx-int8": "{stem}_int8.onnx",
+    "openvino": "{stem}_openvino_model",
+    "openvino-int8": "{stem}_int8_openvino_model",
+}
+
+
+def weights_for_backend(model_path, backend="torch"):
+    """Path of the weights `backend` uses, derived from the .pt path"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    model_path = Path(model_path)
+    return model_path.with_name(BACKENDS[backend].format(stem=model_path.stem))
+
+
 class MLBatPipeline:
-    def __init__(self, model_path='ml_model/model_weights/best.pt'):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='ml_model/model_weights/best.pt', backend="torch"):
+        weights = weights_for_backend(model_path, backend)
+        if backend != "torch" and not weights.exists():
+            raise FileNotFoundError(
+                f"No {backend} weights at {weights}; "
+                f"run ml_model/training/export_model.py first"
+            )
+        self.backend = backend
+        self.model = YOLO(str(weights), task="detect")
 
-    def process_video(self, video_path, output_path, conf_threshold=0.4):
-        video_path = str(video_path)
-        output_path = str(output_path)
+    def _make_tracker(self):
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml('bytetrack.yaml')))
+        # ultralytics' own track() always uses frame_rate=30
+        return BYTETracker(args=cfg, frame_rate=30)
 
-        # Ensure output directory exists
-        out_dir = Path(output_path).parent
-        out_dir.mkdir(parents=True, exist_ok=True)
+    def _associate(self, tracker, result):
+        """Same post-processing as model.track(): keep tracked boxes, attach ids"""
+        det = result.boxes.cpu().numpy()
+        tracks = tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            return result
 
-        # Use temporary output with different codec
-        temp_output = output_path.replace('.mp4', '_temp.avi')
+        idx = tracks[:, -1].astype(int)
+        result = result[idx]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return result
 
-        # Probe video properties
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.release()
+    def _seed_flows(self, result, gray):
+        """One LK patch per box: [flow, box row, seeded point count]"""
+        flows = []
+        if result.boxes is None:
+            return flows
+        for row in result.boxes.data.cpu().numpy():
+            x1, y1, x2, y2 = row[:4]
+            flow = PatchOpticalFlow()
+            rect = (((x1 + x2) / 2, (y1 + y2) / 2), (x2 - x1, y2 - y1), 0.0)
+            if not flow.init(gray, rect, expand=1.0):
+                return None
+            flows.append([flow, row.copy(), len(flow.prev_pts)])
+        return flows
 
-        if fps <= 0:
-            fps = 30
+    def _interpolate(self, prev, flows, frame, gray, min_confidence):
+        """
+        Result for a skipped frame: the last boxes moved by their patch
+        flow, confidence scaled by the share of surviving points.
+        None if any box loses its points, so the caller re-detects.
+        """
+        rows = []
+        for entry in flows:
+            flow, row, seed = entry
+            step = flow.step(gray)
+            if step is None:
+                return None
+            dx, dy, pts = step
 
-        # Write to AVI first (more compatible)
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        out = cv2.VideoWriter(temp_output, fourcc, fps, (width, height))
+            kept = min(1.0, len(pts) / seed)
+            if kept < min_confidence:
+                return None
 
-        if not out.isOpened():
-            raise RuntimeError("❌ VideoWriter failed to open output file")
+            row[[0, 2]] += dx
+            row[[1, 3]] += dy
+            moved = row.copy()
+            moved[-2] *= kept  # [..., conf, cls]
+            rows.append(moved)
 
-        print(f"✅ Writing temporary output to: {temp_output}")
-        print(f"Video: {width}x{height} @ {fps} FPS")
+        result = Results(frame, path=prev.path, names=prev.names)
+        if rows:
+            result.update(boxes=torch.as_tensor(np.stack(rows)))
+        return result
 
-        all_detections = []
-        frame_idx = 0
+    def detect(self, frame, conf_threshold=0.4):
+        """Single-frame detection (live mode): [{"bbox", "confidence"}]"""
+        result = self.model.predict(frame, conf=conf_threshold, iou=0.5, verbose=False)[0]
+        if result.boxes is None or len(result.boxes) == 0:
+            return []
 
-        results = self.model.track(
-            source=video_path,
-            conf=conf_threshold,
-            iou=0.5,
-            tracker='bytetrack.yaml',
-            stream=True,
-            verbose=False
+        boxes = result.boxes.xyxy.cpu().numpy()
+        confs = result.boxes.conf.cpu().numpy()
+        detections = []
+        for box, conf in zip(boxes, confs):
+            x1, y1, x2, y2 = map(int, box)
+            detections.append({
+                "track_id": -1,
+                "bbox": [x1, y1, x2 - x1, y2 - y1],
+                "confidence": float(conf)
+            })
+        return detections
+
+    def _collect(self, result, frame_idx, detections, scale=1.0):
+        """
+        Append a result's boxes to detections, in source pixels for
+        frames decoded at `scale`; (xyxy, confs, ids) or None
+        """
+        if result.boxes is None or len(result.boxes) == 0:
+            return None
+
+        boxes = result.boxes.xyxy.cpu().numpy()
+        confs = result.boxes.conf.cpu().numpy()
+
+        if result.boxes.id is not None:
+            track_ids = result.boxes.id.cpu().numpy().astype(int)
+        else:
+            track_ids = np.full(len(boxes), -1)
+
+        xyxy = (boxes / scale if scale != 1.0 else boxes).astype(int)
+        detections.extend(
+            frame=frame_idx,
+            track_id=track_ids,
+            x=xyxy[:, 0],
+            y=xyxy[:, 1],
+            w=xyxy[:, 2] - xyxy[:, 0],
+            h=xyxy[:, 3] - xyxy[:, 1],
+            confidence=confs
         )
+        return boxes, confs, track_ids
 
-        for result in results:
-            frame = result.orig_img.copy()
+    def _annotate(self, result, frame_idx, detections):
+        found = self._collect(result, frame_idx, detections)
+        frame = result.orig_img.copy()
+        if found is not None:
+            draw_detections(frame, *found)
+        return frame
 
-            if result.boxes is not None and len(result.boxes) > 0:
-                boxes = result.boxes.xyxy.cpu().numpy()
-                confs = result.boxes.conf.cpu().numpy()
+    def process_video(self, video_path, output_path, conf_threshold=0.4,
+                      progress_callback=None, encode_preset="fast", batch_size=1,
+                      queue_size=8, start_frame=0, end_frame=None, warmup_frames=0,
+                      return_detections=False, tracks_path=None,
+                      max_interval=1, min_flow_confidence=0.3, decode_height=None):
+        """
+        Track, annotate and encode frames [start_frame, end_frame) of a video
+        (the whole video by default).
 
-                if result.boxes.id is not None:
-                    track_ids = result.boxes.id.cpu().numpy().astype(int)
-                else:
-                    track_ids = [-1] * len(boxes)
+        For chunked processing, warmup_frames before start_frame are run
+        through the tracker but not written; their detections are only
+        returned (with return_detections) so chunk stitching can match ids.
+
+        Detections are kept as DETECTION_DTYPE rows; with tracks_path they
+        are saved there as .npz together with the per-frame trajectory.
+        With output_path None nothing is drawn or encoded (metrics and
+        tracks only); utils.render.render_tracks can draw the video later.
+        Such runs decode taller videos at decode_height (YOLO downsizes
+        to its input size anyway); detections stay in source pixels.
+
+        max_interval > 1 runs YOLO only every 1..max_interval frames
+        depending on motion and moves the boxes by optical flow in
+        between (frame by frame, so batch_size is ignored).
+        """
+        video_path = str(video_path)
+        render = output_path is not None
 
-                for box, conf, tid in zip(boxes, confs, track_ids):
-                    x1, y1, x2, y2 = map(int, box)
+        if render:
+            output_path = str(output_path)
+            # Ensure output directory exists
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(
+        if max_interval > 1:
+            batch_size = 1   # flow interpolation goes frame by frame
+
+        # Seek, and downscale for metrics-only runs, in the decoder.
+        # Frames come from a ring sized to what the pipeline holds at
+        # once: the queued batches plus the one decoding and processing.
+        first_frame = max(0, start_frame - warmup_frames)
+        video = VideoSource(
+            video_path, first_frame, end_frame,
+            max_height=None if render else decode_height,
+            buffers=(queue_size + 2) * batch_size + 1
+        )
+        fps = video.fps
+        width, height = video.width, video.height
+        total_frames = max(0, video.end_frame - start_frame)
+
+        out = None
+        if render:
+            # Single-pass H.264 encode straight from the annotated frames
+            out = make_h264_writer(output_path, fps, width, height, preset=encode_preset)
+            print(f"✅ Writing output to: {output_path}")
+        print(f"Video: {width}x{height} @ {fps} FPS")
+
+        all_detections = ColumnBuffer(DETECTION_DTYPE)
+        profile = Profile()
+        frame_idx = first_frame
+        skipped = 0
+
+        # One ByteTrack per video, fed frame by frame. model.track() binds
+        # persist on its first call only, so per-frame track() calls would
+        # not reliably keep (or reset) ids across frames and videos.
+        tracker = self._make_tracker()
+
+        if max_interval > 1:
+            # Adaptive mode: YOLO + ByteTrack on motion-dependent keyframes,
+            # LK flow moves the last boxes on the frames in between
+            gate = AdaptiveInterval(max_interval)
+            source = ([frame] for frame in video)
+            last = None   # [result, flows] of the last keyframe
+
+            def infer(frames):
+                nonlocal last, skipped
+                frame = frames[0]
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+                if not gate.due(gray) and last is not None and last[1] is not None:
+                    with profile("flow"):
+                        result = self._interpolate(
+                            last[0], last[1], frame, gray, min_flow_confidence
+                        )
+                    if result is not None:
+                        skipped += frame_idx >= start_frame
+                        return [result]
+
+                gate.detected()
+                with profile("inference"):
+                    result = self.model.predict(
                         frame,
-                        f"Bat {tid} {conf:.2f}",
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 255, 0),
-                        2
+                        conf=conf_threshold,
+                        iou=0.5,
+                        verbose=False
+                    )[0]
+                with profile("association"):
+                    result = self._associate(tracker, result)
+                with profile("flow"):
+                    last = [result, self._seed_flows(result, gray)]
+                return [result]
+        else:
+            # Detect on whole batches (or single frames), then run
+            # ByteTrack association frame by frame
+            source = batched(video, batch_size)
+
+            def infer(frames):
+                with profile("inference"):
+                    batch = self.model.predict(
+                        frames,
+                        conf=conf_threshold,
+                        iou=0.5,
+                        verbose=False
                     )
+                with profile("association"):
+                    return [self._associate(tracker, r) for r in batch]
 
-                    all_detections.append({
-                        "frame": frame_idx,
-                        "track_id": int(tid),
-                        "bbox": [x1, y1, x2 - x1, y2 - y1],
-                        "confidence": float(conf)
-                    })
+        def process(frames):
+            nonlocal frame_idx
+            annotated = []
+            for result in infer(frames):
+                if not render:
+                    self._collect(result, frame_idx, all_detections, video.scale)
+                    frame_idx += 1
+                    continue
+                with profile("drawing"):
+                    frame = self._annotate(result, frame_idx, all_detections)
+                if frame_idx >= start_frame:
+                    annotated.append(frame)
+                frame_idx += 1
 
-            out.write(frame)
-            frame_idx += 1
+            if progress_callback is not None:
+                progress_callback(max(0, frame_idx - start_frame), total_frames)
+            return annotated
 
-        out.release()
+        def write(frames):
+            for frame in frames:
+                out.write(frame)
 
-        print("🔄 Converting to browser-compatible MP4...")
-        
-        # Convert to MP4 with ffmpeg
+        pipeline = ThreadedVideoPipeline(source, process, write if render else None,
+                                         queue_size=queue_size, profile=profile)
         try:
-            subprocess.run([
-                'ffmpeg', '-y', '-i', temp_output,
-                '-c:v', 'libx264',
-                '-preset', 'fast',
-                '-crf', '23',
-                '-pix_fmt', 'yuv420p',
-                output_path
-            ], check=True, capture_output=True, text=True)
-            
-            # Remove temp file
-            os.remove(temp_output)
-            
-        except subprocess.CalledProcessError as e:
-            print(f"❌ FFmpeg conversion failed: {e.stderr}")
-            raise RuntimeError("FFmpeg conversion failed")
-
-        unique_tracks = len(
-            set(d["track_id"] for d in all_detections if d["track_id"] != -1)
+            stage_stats = pipeline.run()
+        finally:
+            video.close()
+            if out is not None:
+                with profile("encode_flush"):
+                    out.release()
+
+        all_detections = all_detections.array()
+        detections = all_detections[all_detections["frame"] >= start_frame]
+        track_ids = detections["track_id"]
+        unique_tracks = len(np.unique(track_ids[track_ids != -1]))
+
+        trajectory = trajectory_from_detections(
+            detections, max(0, frame_idx - start_frame), frame_offset=start_frame
         )
+        metrics = compute_swing_metrics(trajectory, fps)
+
+        if tracks_path is not None:
+            save_tracks(
+                tracks_path, fps,
+                detections=detections,
+                trajectory=trajectory_to_array(trajectory)
+            )
 
         print("✅ ML processing finished")
 
-        return {
-            "total_frames": frame_idx,
-            "total_detections": len(all_detections),
+        result = {
+            "total_frames": max(0, frame_idx - start_frame),
+            "total_detections": len(detections),
             "unique_bats": unique_tracks,
+            "metrics": metrics,
             "output_video": output_path,
-            "fps": fps
+            "fps": fps,
+            "batch_size": batch_size,
+            "frames_interpolated": skipped,
+            "stages": stage_stats,
+            "profile": profile.to_dict()
         }
+        if tracks_path is not None:
+            result["tracks"] = str(tracks_path)
+        if return_detections:
+            result["detections"] = all_detections
+        return result
 
 
 if __name__ == "__main__":
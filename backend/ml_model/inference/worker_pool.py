@@ -0,0 +1,196 @@
+import os
+import time
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+# One pipeline per worker process, loaded once by the pool initializer
+_pipeline = None
+_progress_queue = None
+
+# Seconds between progress messages sent back to the server
+PROGRESS_INTERVAL = 0.5
+
+
+def default_worker_count():
+    """Workers sized to CPU cores (overridable with CRICTRAC_ML_WORKERS)."""
+    env = os.environ.get("CRICTRAC_ML_WORKERS")
+    if env:
+        return max(1, int(env))
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+def _init_worker(model_path, backend, torch_threads, progress_queue):
+    global _pipeline, _progress_queue
+
+    _progress_queue = progress_queue
+
+    # Split the cores between workers instead of letting each
+    # torch process grab all of them
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    from ml_model.inference.pipeline_ml import MLBatPipeline
+
+    t0 = time.perf_counter()
+    _pipeline = MLBatPipeline(model_path, backend)
+    print(f"✅ ML worker {os.getpid()} loaded {backend} model in {time.perf_counter() - t0:.2f}s")
+
+
+def _warmup():
+    return os.getpid()
+
+
+def _progress_reporter(job_id):
+    last = [0.0]
+
+    def report(frames_done, total_frames):
+        now = time.monotonic()
+        if now - last[0] >= PROGRESS_INTERVAL:
+            last[0] = now
+            _progress_queue.put((job_id, frames_done, total_frames))
+
+    return report
+
+
+def _run_job(job_id, video_path, output_path, conf_threshold, submitted_at, options):
+    started_at = time.time()
+    t0 = time.perf_counter()
+
+    progress = _progress_reporter(job_id) if job_id is not None else None
+    result = _pipeline.process_video(
+        video_path, output_path, conf_threshold,
+        progress_callback=progress, **options
+    )
+
+    result["timings"] = {
+        "worker_pid": os.getpid(),
+        "queue_wait_s": round(started_at - submitted_at, 4),
+        "process_s": round(time.perf_counter() - t0, 4),
+    }
+    return result
+
+
+def _run_frame(data, shape, conf_threshold):
+    import cv2
+    import numpy as np
+
+    buf = np.frombuffer(data, np.uint8)
+    if shape is not None:
+        frame = buf.reshape(shape)
+    else:
+        frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+    return _pipeline.detect(frame, conf_threshold)
+
+
+class MLWorkerPool:
+    """
+    Long-lived pool of processes that each hold a loaded MLBatPipeline.
+    Jobs are queued to the pool and processed by the next free worker.
+
+    Live frames go to `live_workers` processes of their own, so they
+    never wait behind whole videos or chunks queued on the job workers.
+    """
+
+    def __init__(self, model_path='ml_model/model_weights/best.pt', num_workers=None,
+                 on_progress=None, backend="torch", live_workers=1):
+        self.model_path = str(model_path)
+        self.backend = backend
+        self.num_workers = num_workers or default_worker_count()
+        self.live_workers = max(1, live_workers)
+        self.on_progress = on_progress
+        self.executor = None
+        self.live_executor = None
+        self._progress_queue = None
+        self._listener = None
+
+    def start(self):
+        if self.executor is not None:
+            return
+
+        torch_threads = max(1, (os.cpu_count() or 1) // (self.num_workers + self.live_workers))
+
+        # spawn: torch is not fork-safe once its thread pools exist
+        ctx = mp.get_context("spawn")
+        self._progress_queue = ctx.Queue()
+        self._listener = threading.Thread(target=self._drain_progress, daemon=True)
+        self._listener.start()
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.backend, torch_threads, self._progress_queue),
+        )
+
+        self.live_executor = ProcessPoolExecutor(
+            max_workers=self.live_workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.backend, torch_threads, None),
+        )
+
+        # Force every worker to start (and load the model) now,
+        # not on the first upload
+        pids = {
+            f.result()
+            for f in [self.executor.submit(_warmup) for _ in range(self.num_workers)]
+        }
+        live_pids = {
+            f.result()
+            for f in [self.live_executor.submit(_warmup) for _ in range(self.live_workers)]
+        }
+        print(f"✅ ML worker pool ready ({len(pids)}/{self.num_workers} workers, "
+              f"{len(live_pids)}/{self.live_workers} live)")
+
+    def submit(self, video_path, output_path, conf_threshold=0.4, job_id=None,
+               **options):
+        """
+        Queue a video; returns a concurrent.futures.Future with the result dict.
+        If job_id is given, progress is reported through on_progress.
+        output_path None skips the annotated video (tracks/metrics only).
+        Extra options are passed on to MLBatPipeline.process_video.
+        """
+        if self.executor is None:
+            raise RuntimeError("ML worker pool is not started")
+
+        return self.executor.submit(
+            _run_job, job_id, str(video_path),
+            str(output_path) if output_path is not None else None,
+            conf_threshold, time.time(), options
+        )
+
+    def submit_frame(self, data, shape=None, conf_threshold=0.4):
+        """
+        Detect on one live frame: encoded image bytes, or raw BGR bytes
+        with shape (h, w, 3). Returns a Future with the detections.
+        Runs on the live workers, not behind queued jobs.
+        """
+        if self.live_executor is None:
+            raise RuntimeError("ML worker pool is not started")
+        return self.live_executor.submit(_run_frame, bytes(data), shape, conf_threshold)
+
+    def _drain_progress(self):
+        while True:
+            msg = self._progress_queue.get()
+            if msg is None:
+                return
+            if self.on_progress is not None:
+                self.on_progress(*msg)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.live_executor is not None:
+            self.live_executor.shutdown(wait=True, cancel_futures=True)
+            self.live_executor = None
+        if self._listener is not None:
+            self._progress_queue.put(None)
+            self._listener.join()
+            self._listener = None
@@ -0,0 +1,128 @@
+# export_model.py
+# Export the trained bat detector to a CPU runtime format.
+#
+#   cd backend
+#   python ml_model/training/export_model.py --format openvino --int8
+#   python ml_model/training/export_model.py --format onnx --int8
+#
+# Outputs land next to the weights with the names MLBatPipeline looks
+# for (see ml_model/inference/pipeline_ml.py, BACKENDS):
+#   best.onnx, best_int8.onnx, best_openvino_model/, best_int8_openvino_model/
+
+import sys
+import shutil
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from ml_model.inference.pipeline_ml import weights_for_backend
+
+DEFAULT_WEIGHTS = 'ml_model/model_weights/best.pt'
+DEFAULT_DATA = 'ml_model/training/dataset/data.yaml'
+CALIBRATION_DIR = Path('ml_model/training/dataset/valid/images')
+
+
+def _letterbox(img, size):
+    """Resize keeping aspect and pad to size x size, as YOLO preprocesses"""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    out = np.full((size, size, 3), 114, np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out
+
+
+def calibration_batches(image_dir, imgsz, limit):
+    """NCHW float32 RGB tensors in [0, 1] from dataset images"""
+    paths = sorted(p for p in Path(image_dir).iterdir()
+                   if p.suffix.lower() in (".jpg", ".jpeg", ".png"))[:limit]
+    for p in paths:
+        img = cv2.imread(str(p))
+        if img is None:
+            continue
+        img = _letterbox(img, imgsz)[:, :, ::-1]
+        yield np.ascontiguousarray(img.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def quantize_onnx(fp32_path, int8_path, imgsz, calib_dir, calib_images):
+    """Static int8 (QDQ) quantization, calibrated on dataset images"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+
+    input_name = ort.InferenceSession(
+        str(fp32_path), providers=["CPUExecutionProvider"]
+    ).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = calibration_batches(calib_dir, imgsz, calib_images)
+
+        def get_next(self):
+            batch = next(self.batches, None)
+            return None if batch is None else {input_name: batch}
+
+    quantize_static(
+        str(fp32_path), str(int8_path), Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return int8_path
+
+
+def export(weights, fmt, int8=False, imgsz=640, dynamic=True,
+           data=DEFAULT_DATA, calib_images=200):
+    weights = Path(weights)
+    target = weights_for_backend(weights, f"{fmt}-int8" if int8 else fmt)
+    model = YOLO(str(weights))
+
+    if fmt == "openvino":
+        # ultralytics calibrates int8 through NNCF on the `data` split
+        out = model.export(format="openvino", imgsz=imgsz, dynamic=dynamic,
+                           int8=int8, data=data if int8 else None)
+    else:
+        out = model.export(format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True)
+        if int8:
+            # the fp32 model stays as best.onnx (the "onnx" backend)
+            out = quantize_onnx(Path(out), target, imgsz, CALIBRATION_DIR, calib_images)
+
+    out = Path(out)
+    if out.resolve() != target.resolve():
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists():
+            target.unlink()
+        shutil.move(str(out), str(target))
+
+    print(f"✅ Exported {weights} -> {target}")
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the bat detector for CPU inference")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--format", choices=("onnx", "openvino"), default="openvino")
+    parser.add_argument("--int8", action="store_true",
+                        help="quantize to int8, calibrated on dataset images")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--static", action="store_true",
+                        help="fixed batch 1 input (no batched inference)")
+    parser.add_argument("--data", default=DEFAULT_DATA,
+                        help="dataset yaml for OpenVINO int8 calibration")
+    parser.add_argument("--calib-images", type=int, default=200,
+                        help="images used for ONNX int8 calibration")
+    args = parser.parse_args()
+
+    export(args.weights, args.format, args.int8, args.imgsz, not args.static,
+           args.data, args.calib_images)
@@ -1,13 +1,69 @@
 import cv2
+import numpy as np
 
-def filter_long_contours(contours):
-    candidates = []
+# Smallest bat contour, in px^2 at REFERENCE_HEIGHT
+MIN_AREA = 150
+REFERENCE_HEIGHT = 720
 
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area < 150:
-            continue
+MIN_ASPECT = 2.0
+
+# Candidate score: weights of relative area, elongation and closeness to
+# the previous bat (the last one only counts when a previous bat is known)
+SCORE_WEIGHTS = (0.5, 0.2, 0.3)
+ASPECT_CAP = 8.0    # elongation beyond this scores the same
+
+def min_area_for(height):
+    """MIN_AREA scaled to a frame `height` px tall (area goes with height^2)"""
+    return MIN_AREA * (height / REFERENCE_HEIGHT) ** 2
+
+def contour_areas(contours):
+    """cv2.contourArea of every contour in one pass (shoelace over all points)"""
+    if len(contours) == 0:
+        return np.empty(0)
+
+    lengths = np.fromiter(map(len, contours), dtype=np.intp, count=len(contours))
+    pts = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+    starts = np.zeros(len(lengths), np.intp)
+    np.cumsum(lengths[:-1], out=starts[1:])
+
+    # Next point of each point, wrapping around within its own contour
+    nxt = np.arange(1, len(pts) + 1)
+    nxt[starts + lengths - 1] = starts
+
+    x, y = pts[:, 0], pts[:, 1]
+    cross = x * y[nxt] - x[nxt] * y
+    return 0.5 * np.abs(np.add.reduceat(cross, starts))
+
+def score_candidates(candidates, prev=None):
+    """
+    Higher is more bat-like: big, elongated and, given prev = (cx, cy,
+    length) of the last bat, near it (Gaussian falloff over one length).
+    """
+    w_area, w_elong, w_prox = SCORE_WEIGHTS
+    area = np.array([c[2] for c in candidates])
+    aspect = np.array([c[3] for c in candidates])
+
+    score = w_area * area / area.max()
+    score += w_elong * np.minimum(aspect, ASPECT_CAP) / ASPECT_CAP
+
+    if prev is not None:
+        px, py, length = prev
+        centres = np.array([c[0][0] for c in candidates])
+        d = np.hypot(centres[:, 0] - px, centres[:, 1] - py)
+        score += w_prox * np.exp(-0.5 * (d / max(length, 1.0)) ** 2)
+    return score
+
+def filter_long_contours(contours, min_area=MIN_AREA, prev=None):
+    """
+    Elongated contours as (rect, cnt, area, aspect), best score first.
+    Areas are computed for all contours at once; only those of at least
+    min_area get a rotated rect fitted.
+    """
+    areas = contour_areas(contours)
+    candidates = []
 
+    for i in np.flatnonzero(areas >= min_area):
+        cnt = contours[i]
         rect = cv2.minAreaRect(cnt)
         (cx, cy), (w, h), _ = rect
 
@@ -17,9 +73,10 @@ def filter_long_contours(contours):
         aspect = max(w, h) / (min(w, h) + 1e-6)
 
         # VERY RELAXED
-        if aspect > 2.0:
-            candidates.append((rect, cnt, area, aspect))
+        if aspect > MIN_ASPECT:
+            candidates.append((rect, cnt, float(areas[i]), aspect))
 
-    # biggest first
-    candidates.sort(key=lambda x: x[2], reverse=True)
+    if len(candidates) > 1:
+        order = np.argsort(-score_candidates(candidates, prev), kind="stable")
+        candidates = [candidates[i] for i in order]
     return candidates
@@ -22,7 +22,6 @@ def fuse_edges_and_motion(frame, gray, fg):
     # FINAL COMBINATION
     combined = cv2.bitwise_or(motion_edges, moving_color)
 
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2,8))
     # Thin out thick regions (kills body, keeps bat)
     thin_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
     combined = cv2.erode(combined, thin_kernel, iterations=2)
@@ -32,3 +31,68 @@ def fuse_edges_and_motion(frame, gray, fg):
 
 
     return combined, edges
+
+
+class EdgeMotionFuser:
+    """
+    Stateful version of fuse_edges_and_motion for per-frame use.
+
+    Every intermediate image lives in a buffer that is allocated once
+    (and only regrown for a larger frame) and written with dst=, so
+    steady-state frames allocate nothing. Smaller inputs such as ROI
+    crops use views into the same buffers.
+
+    The returned arrays are overwritten by the next call.
+    """
+
+    LOWER_BAT = np.array([5, 30, 60], dtype=np.uint8)
+    UPPER_BAT = np.array([35, 255, 255], dtype=np.uint8)
+
+    def __init__(self):
+        self.thin_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._shape = (0, 0)
+
+    def _ensure(self, h, w):
+        if h <= self._shape[0] and w <= self._shape[1]:
+            return
+
+        H = max(h, self._shape[0])
+        W = max(w, self._shape[1])
+        self._shape = (H, W)
+        self._blur = np.empty((H, W), np.uint8)
+        self._edges = np.empty((H, W), np.uint8)
+        self._hsv = np.empty((H, W, 3), np.uint8)
+        self._mask = np.empty((H, W), np.uint8)
+        self._combined = np.empty((H, W), np.uint8)
+        self._tmp = np.empty((H, W), np.uint8)
+
+    def fuse(self, frame, gray, fg):
+        h, w = gray.shape[:2]
+        self._ensure(h, w)
+
+        blur = self._blur[:h, :w]
+        edges = self._edges[:h, :w]
+        hsv = self._hsv[:h, :w]
+        mask = self._mask[:h, :w]
+        combined = self._combined[:h, :w]
+        tmp = self._tmp[:h, :w]
+
+        # Edges
+        cv2.GaussianBlur(gray, (5, 5), 0, dst=blur)
+        cv2.Canny(blur, 60, 160, edges=edges)
+
+        # Motion + edges
+        cv2.bitwise_and(edges, fg, dst=tmp)
+
+        # Moving bat colour
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+        cv2.inRange(hsv, self.LOWER_BAT, self.UPPER_BAT, dst=mask)
+        cv2.bitwise_and(mask, fg, dst=mask)
+
+        cv2.bitwise_or(tmp, mask, dst=combined)
+
+        # Thin out thick regions, then reconnect thin structures
+        cv2.erode(combined, self.thin_kernel, dst=tmp, iterations=2)
+        cv2.dilate(tmp, self.thin_kernel, dst=combined, iterations=1)
+
+        return combined, edges
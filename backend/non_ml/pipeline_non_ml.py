@@ -1,23 +1,332 @@
 import cv2
+import os
 import sys
+import json
+import time
+import argparse
 import numpy as np
-
+from pathlib import Path
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+# Make backend/ importable when run as a script
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from utils.video_io import (
+    read_frames, probe_video, make_h264_writer, concat_videos, VideoSource,
+    ThreadedVideoPipeline
+)
+from utils.chunking import plan_chunks, remove_parts
+from utils.metrics import trajectory_from_records, compute_swing_metrics
+from utils.tracks import records_to_frame_states, trajectory_to_array, save_tracks
+from utils.shots import (
+    segment_shots, shot_summary, whole_video_shot, best_shot, shots_array
+)
+from utils.profiling import Profile, NULL_PROFILE
+from utils.render import draw_rect, draw_lost
 from motion.bg_subtractor import MotionSegmenter   # kept for structure, NOT used
-from motion.edge_fusion import fuse_edges_and_motion
-from geometry.contour_filter import filter_long_contours
+from motion.edge_fusion import EdgeMotionFuser
+from geometry.contour_filter import filter_long_contours, min_area_for, MIN_AREA
 from geometry.min_rect import rect_to_bbox
+from geometry.pca_orientation import contour_pca_angle
+from tracking.kalman import KalmanCentroid
+from tracking.optical_flow import PatchOpticalFlow
+from tracking.adaptive import AdaptiveInterval
+
+# Frames queued between decode, tracking and encode
+QUEUE_SIZE = 8
 
 
 class BatTracker:
-    def __init__(self):
+    def __init__(self, use_roi=True, roi_scale=1.0, roi_margin=48,
+                 max_interval=1, min_flow_confidence=0.3,
+                 track=False, redetect_interval=15, max_lost=10, max_flow_step=0.03,
+                 pyramid_height=None):
         self.prev_gray = None
+        self.state = "IDLE"
+
+        # Set to a utils.profiling.Profile to time diff/fusion/contours/flow
+        self.profile = NULL_PROFILE
+
+        # ---- REUSED BUFFERS / KERNELS (no per-frame allocation) ----
+        # NOTE: "combined" in results is overwritten by the next frame
+        self.open_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+        self.fuser = EdgeMotionFuser()
+        self._gray_buf = None
+        self._diff = None
+        self._fg = None
+
+        # ---- ROI SEARCH AROUND THE PREDICTED BAT ----
+        self.use_roi = use_roi
+        self.roi_scale = roi_scale      # padding, in bat lengths
+        self.roi_margin = roi_margin    # minimum padding in px
+        self.kalman = KalmanCentroid()
+        self._prediction = None
+        self.last_rect = None
+        self.last_angle = None
+
+        # ---- ADAPTIVE DETECTION (max_interval > 1) ----
+        # Full detection every 1..max_interval frames depending on motion;
+        # frames in between follow the bat with LK flow + Kalman
+        self.gate = AdaptiveInterval(max_interval)
+        self.flow = PatchOpticalFlow()
+        self.flow_seed = 0
+        self._flow_contour = None   # bat contour the flow points were seeded in
+        self.min_flow_confidence = min_flow_confidence
+
+        # ---- TRACK MODE (track=True) ----
+        # A detection seeds Kalman + LK flow on the bat's contour; later
+        # frames are tracked, re-detecting every redetect_interval frames.
+        # A re-detection that finds nothing ends the track, so no frame is
+        # tracked more than redetect_interval frames past a detection.
+        # Flow only carries slow frames (centre step up to max_flow_step
+        # bat lengths); faster ones go back to the detector.
+        # When flow or the bat is lost the Kalman prediction coasts for up
+        # to max_lost frames (LOST) while the ROI is searched, then IDLE.
+        self.track = track
+        self.max_flow_step = max_flow_step
+        self.redetect_interval = redetect_interval
+        self.max_lost = max_lost
+        self.since_detect = 0
+        self.lost_frames = 0
+
+        # ---- PYRAMID SEARCH (pyramid_height) ----
+        # On frames taller than pyramid_height, whole-frame searches run on
+        # a downscaled copy and the winner is refined at full resolution
+        # in its neighbourhood. Contour area thresholds follow resolution.
+        self.pyramid_height = pyramid_height
+        self.min_area = MIN_AREA
+        self._small_frame = None
+        self._small_gray = None
+        self._small_prev = None
+
+    def _predict(self):
+        """This frame's Kalman prediction (predict() runs at most once per frame)"""
+        if self._prediction is None and self.kalman.initialized:
+            self._prediction = self.kalman.predict()
+        return self._prediction
+
+    def _search_roi(self, shape):
+        """Padded window around the Kalman-predicted centre of the last rect"""
+        if not self.use_roi or self.last_rect is None:
+            return None
+
+        cx, cy = self._predict()
+        _, (w, h), _ = self.last_rect
+        pad = max(w, h) * self.roi_scale + self.roi_margin
+
+        H, W = shape[:2]
+        x1 = int(max(0, cx - pad))
+        y1 = int(max(0, cy - pad))
+        x2 = int(min(W, cx + pad))
+        y2 = int(min(H, cy + pad))
+
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return None
+        return x1, y1, x2, y2
+
+    def _ensure_buffers(self, shape):
+        H, W = shape[:2]
+        if self._gray_buf is None or self._gray_buf.shape != (H, W):
+            self.prev_gray = None
+            self._gray_buf = np.empty((H, W), np.uint8)
+            self._diff = np.empty((H, W), np.uint8)
+            self._fg = np.empty((H, W), np.uint8)
+
+            if self.pyramid_height:
+                self.min_area = min_area_for(H)
+                if H > self.pyramid_height:
+                    h = self.pyramid_height
+                    w = max(1, round(W * h / H))
+                    self._small_frame = np.empty((h, w, 3), np.uint8)
+                    self._small_gray = np.empty((h, w), np.uint8)
+                    self._small_prev = np.empty((h, w), np.uint8)
+                else:
+                    self._small_frame = self._small_gray = self._small_prev = None
+
+    def _prev_hint(self):
+        """(cx, cy, length) where the bat should be, for candidate scoring"""
+        if self.last_rect is None:
+            return None
+        (cx, cy), (w, h), _ = self.last_rect
+        if self._prediction is not None:
+            cx, cy = self._prediction
+        return cx, cy, max(w, h)
+
+    def _detect(self, frame, gray, prev_gray, offset=(0, 0), min_area=None, prev=None):
+        h, w = gray.shape[:2]
+        diff = self._diff[:h, :w]
+        fg = self._fg[:h, :w]
+
+        with self.profile("diff"):
+            cv2.absdiff(prev_gray, gray, dst=diff)
+
+            # Threshold for FAST motion (bat)
+            cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY, dst=fg)
+
+            # VERY light cleanup
+            cv2.morphologyEx(fg, cv2.MORPH_OPEN, self.open_kernel, dst=fg, iterations=1)
+
+        # ---- EDGE + COLOR FUSION ----
+        with self.profile("fusion"):
+            combined, _ = self.fuser.fuse(frame, gray, fg)
+
+        # ---- CONTOURS (in full-frame coordinates) ----
+        with self.profile("contours"):
+            contours, _ = cv2.findContours(
+                combined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                offset=offset
+            )
+            candidates = filter_long_contours(
+                contours, self.min_area if min_area is None else min_area, prev
+            )
+
+        return candidates, combined
+
+    def _search_full(self, frame, gray, prev_gray, prev=None):
+        """Whole-frame search, on a pyramid level for large frames"""
+        if self._small_gray is None:
+            return self._detect(frame, gray, prev_gray, prev=prev)
+
+        small = self._small_gray
+        size = (small.shape[1], small.shape[0])
+        with self.profile("pyramid"):
+            cv2.resize(frame, size, dst=self._small_frame, interpolation=cv2.INTER_AREA)
+            cv2.resize(gray, size, dst=small, interpolation=cv2.INTER_AREA)
+            cv2.resize(prev_gray, size, dst=self._small_prev, interpolation=cv2.INTER_AREA)
+
+        scale = small.shape[0] / gray.shape[0]
+        if prev is not None:
+            prev = tuple(v * scale for v in prev)
+
+        coarse, combined = self._detect(
+            self._small_frame, small, self._small_prev,
+            min_area=min_area_for(small.shape[0]), prev=prev
+        )
+        if not coarse:
+            return [], combined
+
+        with self.profile("refine"):
+            return [self._refine(frame, gray, prev_gray, coarse[0], scale)], combined
+
+    def _refine(self, frame, gray, prev_gray, candidate, scale):
+        """
+        Map a pyramid-level candidate to full resolution and search again
+        around it; keeps the scaled-up candidate if nothing is found there.
+        """
+        (cx, cy), (w, h), angle = candidate[0]
+        rect = ((cx / scale, cy / scale), (w / scale, h / scale), angle)
+        cnt = (candidate[1] / scale).astype(np.int32)
+        coarse = (rect, cnt, candidate[2] / scale ** 2, candidate[3])
+
+        (cx, cy), (w, h), _ = rect
+        pad = max(w, h) / 2 + self.roi_margin
+        H, W = gray.shape[:2]
+        x1 = int(max(0, cx - pad))
+        y1 = int(max(0, cy - pad))
+        x2 = int(min(W, cx + pad))
+        y2 = int(min(H, cy + pad))
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return coarse
+
+        # Scored by closeness to the coarse rect
+        fine, _ = self._detect(
+            frame[y1:y2, x1:x2], gray[y1:y2, x1:x2],
+            prev_gray[y1:y2, x1:x2], offset=(x1, y1), prev=(cx, cy, max(w, h))
+        )
+        return fine[0] if fine else coarse
+
+    def _lost(self):
+        self.last_rect = None
+        self.last_angle = None
+        self.kalman.reset()
+        self.flow.reset()
+        self.lost_frames = 0
+
+    def _seed_flow(self, gray, rect, contour):
+        # Points only on the bat: corners of the background around it
+        # would hold still and keep the flow "confident" while it moves on
+        self._flow_contour = contour
+        if self.flow.init(gray, rect, contour=contour):
+            self.flow_seed = len(self.flow.prev_pts)
+        else:
+            self.flow.reset()
+
+    def _interpolate(self, gray):
+        """
+        Move the last rect by the median flow of its patch points.
+        None on point loss or when too few of the seeded points survive,
+        so the caller re-detects.
+        """
+        with self.profile("flow"):
+            step = self.flow.step(gray)
+        if step is None:
+            return None
+        dx, dy, pts = step
+
+        confidence = min(1.0, len(pts) / self.flow_seed)
+        if confidence < self.min_flow_confidence:
+            return None
+
+        (cx, cy), size, rect_angle = self.last_rect
+        M = self.flow.transform
+        if M is None:
+            M = np.array([[1.0, 0.0, dx], [0.0, 1.0, dy]])
+        # A swinging bat turns: move the centre (and contour) by the
+        # points' rotation + translation, not just their median shift
+        centre = M @ (cx, cy, 1.0)
+        turn = np.degrees(np.arctan2(M[1, 0], M[0, 0]))
+
+        # Fast motion is where LK is weakest and frame differencing
+        # strongest: hand those frames back to the detector
+        if np.hypot(centre[0] - cx, centre[1] - cy) > self.max_flow_step * max(size):
+            return None
+        rect = ((float(centre[0]), float(centre[1])), size, rect_angle + turn)
+        self._predict()
+        smoothed = self.kalman.update(*rect[0])
+        self.last_rect = rect
+        if self.last_angle is not None:
+            self.last_angle += turn
+        self._flow_contour = cv2.transform(
+            self._flow_contour.reshape(-1, 1, 2).astype(np.float32), M
+        ).round().astype(np.int32)
+
+        # Long tracks: pick fresh corners on the moved contour now and then
+        if self.flow.frame_count >= self.flow.refresh_interval:
+            self._seed_flow(gray, rect, self._flow_contour)
+
+        return {
+            "box": rect_to_bbox(rect),
+            "rect": rect,
+            "angle": self.last_angle,
+            "smoothed": smoothed,
+            "mode": "TRACK",
+            "combined": None,
+            "confidence": confidence,
+            "points": pts,
+            "roi": None
+        }
 
     def process(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        result = self._process(frame)
+
+        # Report state changes, e.g. "DETECT->TRACK", "TRACK->LOST"
+        mode = result["mode"]
+        result["transition"] = f"{self.state}->{mode}" if mode != self.state else None
+        self.state = mode
+        return result
+
+    def _process(self, frame):
+        self._ensure_buffers(frame.shape)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
 
         # ---- FRAME DIFFERENCING (KEY FIX) ----
         if self.prev_gray is None:
-            self.prev_gray = gray.copy()
+            # Keep this frame; the next one goes into a fresh buffer
+            self.prev_gray = gray
+            self._gray_buf = np.empty_like(gray)
             return {
                 "box": None,
                 "rect": None,
@@ -25,30 +334,76 @@ class BatTracker:
                 "mode": "IDLE",
                 "combined": None,
                 "confidence": 0.0,
-                "points": None
+                "points": None,
+                "roi": None
             }
 
-        diff = cv2.absdiff(self.prev_gray, gray)
-        self.prev_gray = gray.copy()
-
-        # Threshold for FAST motion (bat)
-        _, fg = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
-
-        # VERY light cleanup
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-        fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, kernel, iterations=1)
-
-        # ---- EDGE + COLOR FUSION ----
-        combined, _ = fuse_edges_and_motion(frame, gray, fg)
-
-        # ---- CONTOURS ----
-        contours, _ = cv2.findContours(
-            combined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-        )
-
-        candidates = filter_long_contours(contours)
+        # Swap buffers instead of copying: this frame becomes prev,
+        # the old prev is overwritten next frame
+        prev_gray = self.prev_gray
+        self.prev_gray = gray
+        self._gray_buf = prev_gray
+        self._prediction = None
+
+        tracking = self.state in ("DETECT", "TRACK") and self.flow.prev_pts is not None
+        if self.track:
+            self.since_detect += 1
+            detect = not tracking or self.since_detect >= self.redetect_interval
+        else:
+            detect = self.gate.due(gray)    # every frame unless max_interval > 1
+            if not detect and self.last_rect is None:
+                return {
+                    "box": None,
+                    "rect": None,
+                    "angle": None,
+                    "mode": "IDLE",
+                    "combined": None,
+                    "confidence": 0.0,
+                    "points": None,
+                    "roi": None
+                }
+
+        if not detect:
+            result = self._interpolate(gray)
+            if result is not None:
+                return result
+        self.gate.detected()
+        self.since_detect = 0
+
+        candidates = []
+        roi = self._search_roi(frame.shape)
+        hint = self._prev_hint()
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            candidates, combined = self._detect(
+                frame[y1:y2, x1:x2], gray[y1:y2, x1:x2],
+                prev_gray[y1:y2, x1:x2], offset=(x1, y1), prev=hint
+            )
+
+        # No bat yet, or lost inside the ROI: search the whole frame
+        if not candidates:
+            roi = None
+            candidates, combined = self._search_full(frame, gray, prev_gray, hint)
+
+        # Coast on the Kalman prediction for a while before giving up
+        if not candidates and self.track and self.kalman.initialized \
+                and self.lost_frames < self.max_lost:
+            self.lost_frames += 1
+            self.flow.reset()
+            return {
+                "box": None,
+                "rect": None,
+                "angle": None,
+                "smoothed": self._predict(),
+                "mode": "LOST",
+                "combined": combined,
+                "confidence": 0.0,
+                "points": None,
+                "roi": None
+            }
 
         if not candidates:
+            self._lost()
             return {
                 "box": None,
                 "rect": None,
@@ -56,21 +411,38 @@ class BatTracker:
                 "mode": "IDLE",
                 "combined": combined,
                 "confidence": 0.0,
-                "points": None
+                "points": None,
+                "roi": None
             }
 
-        # Pick largest elongated contour
+        # Best-scoring elongated contour
         rect, cnt, area, aspect = candidates[0]
         bbox = rect_to_bbox(rect)
 
+        (cx, cy), _, _ = rect
+        if self.kalman.initialized:
+            self._predict()
+            smoothed = self.kalman.update(cx, cy)
+        else:
+            self.kalman.init(cx, cy)
+            smoothed = (cx, cy)
+        self.last_rect = rect
+        self.last_angle = contour_pca_angle(cnt)
+        self.lost_frames = 0
+
+        if self.track or self.gate.max_interval > 1:
+            self._seed_flow(gray, rect, cnt)
+
         return {
             "box": bbox,
             "rect": rect,
-            "angle": None,
+            "angle": self.last_angle,
+            "smoothed": smoothed,
             "mode": "DETECT",
             "combined": combined,
             "confidence": 0.5,
-            "points": None
+            "points": None,
+            "roi": (roi[0], roi[1], roi[2] - roi[0], roi[3] - roi[1]) if roi else None
         }
 
 
@@ -79,18 +451,335 @@ def visualize(frame, result):
 
     rect = result.get("rect")
     if rect is not None:
-        box = cv2.boxPoints(rect)
-        box = box.astype(int)
+        draw_rect(out, rect)
 
-        cv2.drawContours(out, [box], 0, (0, 255, 0), 2)
+    # predicted centre while the bat is lost
+    if result.get("mode") == "LOST" and result.get("smoothed") is not None:
+        draw_lost(out, result["smoothed"])
 
-        # draw center
-        (cx, cy), _, _ = rect
-        cv2.circle(out, (int(cx), int(cy)), 3, (0, 0, 255), -1)
+    # flow points on tracked frames
+    points = result.get("points")
+    if points is not None:
+        for x, y in points.reshape(-1, 2).astype(int):
+            cv2.circle(out, (int(x), int(y)), 1, (255, 200, 0), -1)
 
     return out
 
 
+def result_to_record(frame_idx, result):
+    """JSON-safe copy of a BatTracker.process result (drops the mask image)"""
+    rect = result.get("rect")
+    if rect is not None:
+        (cx, cy), (w, h), angle = rect
+        rect = [[float(cx), float(cy)], [float(w), float(h)], float(angle)]
+
+    box = result.get("box")
+    roi = result.get("roi")
+    angle = result.get("angle")
+    smoothed = result.get("smoothed")
+    return {
+        "frame": frame_idx,
+        "box": list(box) if box is not None else None,
+        "rect": rect,
+        "roi": list(roi) if roi is not None else None,
+        "angle": float(angle) if angle is not None else None,
+        "smoothed": [float(smoothed[0]), float(smoothed[1])] if smoothed is not None else None,
+        "mode": result.get("mode"),
+        "transition": result.get("transition"),
+        "confidence": float(result.get("confidence") or 0.0),
+    }
+
+
+def _track_range(video_path, output_path, start_frame=0, end_frame=None,
+                 warmup_frames=0, progress_callback=None, encode_preset="fast",
+                 tracker_options=None):
+    """
+    Track and write frames [start_frame, end_frame). warmup_frames before
+    start_frame only prime the tracker (prev_gray, ROI/Kalman state).
+    With output_path None nothing is drawn or encoded.
+    tracker_options are BatTracker keyword arguments (max_interval,
+    track, pyramid_height, ...).
+    Returns (records, fps, stage stats, profile dict); record frame
+    numbers are absolute.
+    """
+    # Decoder-side seek; frames are reused from a ring covering the
+    # pipeline's queue plus the frames being decoded and tracked
+    first_frame = max(0, start_frame - warmup_frames)
+    video = VideoSource(video_path, first_frame, end_frame, buffers=QUEUE_SIZE + 3)
+
+    fps = video.fps
+    width, height = video.width, video.height
+    total_frames = max(0, video.end_frame - start_frame)
+
+    out = None
+    if output_path is not None:
+        out = make_h264_writer(output_path, fps, width, height, preset=encode_preset)
+    profile = Profile()
+    tracker = BatTracker(**(tracker_options or {}))
+    tracker.profile = profile
+    records = []
+    frame_idx = first_frame
+
+    def process(frame):
+        nonlocal frame_idx
+        with profile("tracker"):
+            result = tracker.process(frame)
+        idx = frame_idx
+        frame_idx += 1
+
+        if idx < start_frame:
+            return None  # warm-up only
+
+        records.append(result_to_record(idx, result))
+
+        if progress_callback is not None:
+            progress_callback(len(records), total_frames)
+        if out is None:
+            return None
+        with profile("drawing"):
+            return visualize(frame, result)
+
+    pipeline = ThreadedVideoPipeline(video, process,
+                                     out.write if out is not None else None,
+                                     queue_size=QUEUE_SIZE, profile=profile)
+    try:
+        stats = pipeline.run()
+    finally:
+        video.close()
+        if out is not None:
+            with profile("encode_flush"):
+                out.release()
+
+    return records, fps, stats, profile.to_dict()
+
+
+def _shot_results(records, fps, shots):
+    """Per-shot summaries; records are in frame order"""
+    frames = np.array([r["frame"] for r in records], dtype=np.int64)
+    results = []
+    for shot in shots:
+        lo, hi = np.searchsorted(frames, (shot["start"], shot["end"]))
+        traj = trajectory_from_records(records[lo:hi], shot["end"] - shot["start"],
+                                       frame_offset=shot["start"])
+        results.append(shot_summary(shot, traj, fps))
+    return results
+
+
+def _summary(records, fps, output_path, json_path, stats, profile, shots=None):
+    """
+    Without shots the video is one shot. With shots (utils.shots), the
+    top-level metrics are those of the fastest shot.
+    """
+    trajectory = trajectory_from_records(records)
+    if shots is None:
+        metrics = compute_swing_metrics(trajectory, fps)
+        shot_results = [whole_video_shot(len(records), fps, metrics)]
+        best = 0
+    else:
+        shot_results = _shot_results(records, fps, shots)
+        best = best_shot(shot_results)
+        if best is not None:
+            metrics = shot_results[best]["metrics"]
+        else:
+            metrics = compute_swing_metrics(trajectory, fps)
+
+    with open(json_path, "w") as f:
+        json.dump({"fps": fps, "metrics": metrics, "shots": shot_results,
+                   "frames": records}, f)
+
+    # Same per-frame state, columnar, for analytics
+    tracks_path = Path(json_path).with_suffix(".npz")
+    arrays = dict(
+        frames=records_to_frame_states(records),
+        trajectory=trajectory_to_array(trajectory)
+    )
+    if shots is not None:
+        arrays["shots"] = shots_array(shots)
+    save_tracks(tracks_path, fps, **arrays)
+
+    return {
+        "total_frames": len(records),
+        "frames_detected": sum(1 for r in records if r["mode"] in ("DETECT", "TRACK")),
+        "frames_tracked": sum(1 for r in records if r["mode"] == "TRACK"),
+        "frames_lost": sum(1 for r in records if r["mode"] == "LOST"),
+        "transitions": sum(1 for r in records if r.get("transition")),
+        "metrics": metrics,
+        "shots": shot_results,
+        "best_shot": best,
+        "output_video": str(output_path) if output_path is not None else None,
+        "frames_json": str(json_path),
+        "tracks": str(tracks_path),
+        "fps": fps,
+        "stages": stats,
+        "profile": profile
+    }
+
+
+def run_headless(video_path, output_path, json_path=None,
+                 progress_callback=None, encode_preset="fast", tracker_options=None,
+                 render=True):
+    """
+    Batch mode: no GUI, no playback delay.
+    Writes the annotated video (unless render is False) and a per-frame
+    JSON of tracker results; output_path also names the JSON/npz files.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if json_path is None:
+        json_path = output_path.with_suffix(".json")
+    video_out = output_path if render else None
+
+    records, fps, stats, profile = _track_range(
+        video_path, video_out,
+        progress_callback=progress_callback, encode_preset=encode_preset,
+        tracker_options=tracker_options
+    )
+    return _summary(records, fps, video_out, json_path, stats, profile)
+
+
+def _run_chunk(video_path, part_path, chunk, encode_preset, tracker_options):
+    progress = partial(_print_progress, part=chunk["index"])
+    return _track_range(
+        video_path, part_path,
+        start_frame=chunk["start"], end_frame=chunk["end"],
+        warmup_frames=chunk["warmup"],
+        progress_callback=progress, encode_preset=encode_preset,
+        tracker_options=tracker_options
+    )
+
+
+def run_chunked(video_path, output_path, workers=None, overlap=5,
+                min_chunk_frames=600, json_path=None, encode_preset="fast",
+                tracker_options=None, render=True):
+    """
+    Headless mode for long videos: split into frame-range chunks, track
+    them in a process pool and stitch video and records back in order.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if json_path is None:
+        json_path = output_path.with_suffix(".json")
+
+    info = probe_video(video_path)
+    if info is None:
+        raise RuntimeError(f"Cannot open video {video_path}")
+
+    workers = workers or os.cpu_count() or 1
+    chunks = plan_chunks(info["frame_count"], workers, overlap, min_chunk_frames)
+    if len(chunks) == 1:
+        return run_headless(video_path, output_path, json_path,
+                            _print_progress, encode_preset, tracker_options, render)
+
+    results, profile = _run_ranges(video_path, output_path, chunks, workers,
+                                   encode_preset, tracker_options, render)
+    records = [r for chunk_records, _, _, _ in results for r in chunk_records]
+    res = _summary(records, results[0][1], output_path if render else None, json_path,
+                   [stats for _, _, stats, _ in results], profile.to_dict())
+    res["chunks"] = len(chunks)
+    return res
+
+
+def run_shots(video_path, output_path, workers=None, overlap=5,
+              min_chunk_frames=600, json_path=None, encode_preset="fast",
+              tracker_options=None, render=True):
+    """
+    Headless mode for net sessions: a cheap motion pass finds the shots
+    (utils.shots) and only those windows are tracked, in parallel, each
+    by a fresh tracker. With render, the video is the shots back to
+    back. Videos too short to segment go through run_chunked.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if json_path is None:
+        json_path = output_path.with_suffix(".json")
+
+    t0 = time.perf_counter()
+    shots = segment_shots(video_path)
+    segment_s = time.perf_counter() - t0
+    if shots is None:
+        return run_chunked(video_path, output_path, workers, overlap, min_chunk_frames,
+                           json_path, encode_preset, tracker_options, render)
+    _print_total(sum(s["end"] - s["start"] for s in shots))
+
+    render = render and bool(shots)
+    if shots:
+        results, profile = _run_ranges(video_path, output_path, shots,
+                                       workers or os.cpu_count() or 1,
+                                       encode_preset, tracker_options, render)
+        fps = results[0][1]
+    else:
+        results, profile = [], Profile()
+        fps = probe_video(video_path)["fps"]
+    profile.add("segment", segment_s)
+
+    records = [r for shot_records, _, _, _ in results for r in shot_records]
+    res = _summary(records, fps, output_path if render else None, json_path,
+                   [stats for _, _, stats, _ in results], profile.to_dict(), shots)
+    res["chunks"] = len(shots)
+    return res
+
+
+def _run_ranges(video_path, output_path, chunks, workers, encode_preset,
+                tracker_options, render):
+    """
+    Track frame ranges (plan_chunks / find_shots dicts) in a process
+    pool; with render their videos are joined, in order, into
+    output_path. Returns (per-range _track_range results, Profile).
+    """
+    if render:
+        parts = [str(output_path.with_name(f"{output_path.stem}_part{c['index']}.mp4"))
+                 for c in chunks]
+    else:
+        parts = [None] * len(chunks)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(
+                _run_chunk,
+                [str(video_path)] * len(chunks), parts, chunks,
+                [encode_preset] * len(chunks),
+                [tracker_options] * len(chunks)
+            ))
+        if render:
+            t0 = time.perf_counter()
+            concat_videos(parts, output_path, encode_preset)
+            concat_s = time.perf_counter() - t0
+    finally:
+        if render:
+            remove_parts(parts)
+
+    profile = Profile()
+    for _, _, _, chunk_profile in results:
+        profile.merge(chunk_profile)
+    if render:
+        profile.add("transcode", concat_s)
+    return results, profile
+
+
+_last_progress = {}
+
+
+def _print_total(total_frames):
+    # "TOTAL <frames>": frames that will actually be tracked (shots only)
+    sys.stdout.write(f"TOTAL {total_frames}\n")
+    sys.stdout.flush()
+
+
+def _print_progress(frames_done, total_frames, part=None):
+    # Line protocol read by main.py while the job runs:
+    # "PROGRESS <done> <total> [<chunk>]"
+    last = _last_progress.get(part, 0)
+    if frames_done - last < 25 and frames_done < total_frames:
+        return
+    _last_progress[part] = frames_done
+
+    line = f"PROGRESS {frames_done} {total_frames}"
+    if part is not None:
+        line += f" {part}"
+    # One write per line so chunk processes sharing stdout don't interleave
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
 def main(video_path):
     cap = cv2.VideoCapture(video_path)
     tracker = BatTracker()
@@ -101,11 +790,8 @@ def main(video_path):
         fps = 25  # fallback
     delay = int(1000 / fps)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
+    # Decode runs on its own thread; GUI calls must stay on this one
+    def process(frame):
         result = tracker.process(frame)
         vis = visualize(frame, result)
 
@@ -116,15 +802,64 @@ def main(video_path):
 
         # ---- correct playback speed ----
         if cv2.waitKey(delay) & 0xFF == ord("q"):
-            break
+            pipeline.stop.set()
 
-    cap.release()
-    cv2.destroyAllWindows()
+    pipeline = ThreadedVideoPipeline(read_frames(cap), process)
+    try:
+        stats = pipeline.run()
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
 
+    print(stats)
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python pipeline_non_ml.py input.mp4")
-        sys.exit(1)
 
-    main(sys.argv[1])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Non-ML bat tracker")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?",
+                        help="write annotated video + JSON headlessly (no GUI)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="split long videos across this many processes")
+    parser.add_argument("--min-chunk-frames", type=int, default=600)
+    parser.add_argument("--max-interval", type=int, default=1,
+                        help="run full detection only every 1..N frames, "
+                             "depending on motion (1 = every frame)")
+    parser.add_argument("--track", action="store_true",
+                        help="follow the bat with optical flow between detections "
+                             "(DETECT/TRACK/LOST modes)")
+    parser.add_argument("--pyramid-height", type=int, default=None,
+                        help="search frames taller than this on a downscaled copy, "
+                             "refining the bat at full resolution")
+    parser.add_argument("--shots", action="store_true",
+                        help="track only the high-motion shot windows of long "
+                             "session videos, with per-shot metrics")
+    parser.add_argument("--no-video", action="store_true",
+                        help="only write JSON/npz tracks; render the video later "
+                             "with utils.render.render_tracks")
+    args = parser.parse_args()
+
+    tracker_options = dict(
+        max_interval=args.max_interval,
+        track=args.track,
+        pyramid_height=args.pyramid_height
+    )
+
+    if args.output is None:
+        main(args.input)
+    elif args.shots:
+        res = run_shots(args.input, args.output, args.workers,
+                        min_chunk_frames=args.min_chunk_frames,
+                        tracker_options=tracker_options,
+                        render=not args.no_video)
+        print("RESULT " + json.dumps(res), flush=True)
+    elif args.workers > 1:
+        res = run_chunked(args.input, args.output, args.workers,
+                          min_chunk_frames=args.min_chunk_frames,
+                          tracker_options=tracker_options,
+                          render=not args.no_video)
+        print("RESULT " + json.dumps(res), flush=True)
+    else:
+        res = run_headless(args.input, args.output, progress_callback=_print_progress,
+                           tracker_options=tracker_options, render=not args.no_video)
+        print("RESULT " + json.dumps(res), flush=True)
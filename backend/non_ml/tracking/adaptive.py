@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+class AdaptiveInterval:
+    """
+    Decides which frames get the full detector.
+
+    Motion is the largest block difference between consecutive frames
+    downscaled by `scale` (INTER_AREA averages each block, so sensor
+    noise cancels while a moving bat still stands out). The gap between
+    detections shrinks from max_interval at or below low_motion to every
+    frame at or above high_motion.
+    """
+    def __init__(self, max_interval=8, low_motion=4.0, high_motion=20.0, scale=0.125):
+        self.max_interval = max(1, int(max_interval))
+        self.low_motion = low_motion
+        self.high_motion = high_motion
+        self.scale = scale
+        self.prev_small = None
+        self._small = None
+        self._diff = None
+        self.motion = 0.0
+        self.interval = 1
+        self.since_detect = 0
+
+    def interval_for(self, motion):
+        if motion <= self.low_motion:
+            return self.max_interval
+        if motion >= self.high_motion:
+            return 1
+        t = (motion - self.low_motion) / (self.high_motion - self.low_motion)
+        return max(1, int(round(self.max_interval - t * (self.max_interval - 1))))
+
+    def due(self, gray):
+        """Feed the next grey frame; True if the detector should run on it"""
+        self.since_detect += 1
+        if self.max_interval == 1:
+            return True
+
+        h, w = gray.shape[:2]
+        size = (max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+        if self._small is None or self._small.shape != (size[1], size[0]):
+            self.prev_small = None
+            self._small = np.empty((size[1], size[0]), np.uint8)
+            self._diff = np.empty_like(self._small)
+
+        cv2.resize(gray, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        if self.prev_small is None:
+            self.prev_small = self._small
+            self._small = np.empty_like(self.prev_small)
+            return True
+
+        cv2.absdiff(self._small, self.prev_small, dst=self._diff)
+        self.motion = float(cv2.minMaxLoc(self._diff)[1])
+        self.prev_small, self._small = self._small, self.prev_small
+
+        self.interval = self.interval_for(self.motion)
+        return self.since_detect >= self.interval
+
+    def detected(self):
+        """Call after the detector ran, to restart the gap"""
+        self.since_detect = 0
+
+    def reset(self):
+        self.prev_small = None
+        self.motion = 0.0
+        self.interval = 1
+        self.since_detect = 0
@@ -2,7 +2,8 @@ import cv2
 import numpy as np
 
 class PatchOpticalFlow:
-    def __init__(self, max_corners=150, quality=0.01, min_dist=7, min_points=5):
+    def __init__(self, max_corners=150, quality=0.01, min_dist=7, min_points=5,
+                 max_error=30.0):
         self.lk_params = dict(winSize=(15,15), maxLevel=2,
                        criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
         self.prev_gray = None
@@ -11,11 +12,21 @@ class PatchOpticalFlow:
         self.quality = quality
         self.min_dist = min_dist
         self.min_points = min_points
+        # LK match error (mean abs intensity difference) above which a
+        # point counts as lost: on a fast, turning object LK "converges"
+        # onto the background left behind, with a large error
+        self.max_error = max_error
         self.frame_count = 0
         self.refresh_interval = 10  # Refresh points every N frames
+        self.transform = None       # last step's 2x3 similarity (RANSAC), if any
 
-    def init(self, gray, rect, expand=1.2):
-        """Initialize or reinitialize optical flow tracking patch"""
+    def init(self, gray, rect, expand=1.2, contour=None):
+        """
+        Initialize or reinitialize optical flow tracking patch. With a
+        contour (full-frame coordinates) only corners on or inside it are
+        seeded, so the patch follows the object rather than background
+        texture around it.
+        """
         (cx, cy), (w, h), angle = rect
         size = int(max(w, h) * expand)
         x1 = int(max(0, cx - size/2))
@@ -28,8 +39,17 @@ class PatchOpticalFlow:
             self.prev_pts = None
             return False
             
+        mask = None
+        if contour is not None:
+            mask = np.zeros(roi.shape, np.uint8)
+            shifted = np.asarray(contour, np.int32).reshape(-1, 1, 2) - (x1, y1)
+            # Filled, outline included; any wider and corners of the
+            # background just outside it get seeded too
+            cv2.drawContours(mask, [shifted], 0, 255, -1)
+
         pts = cv2.goodFeaturesToTrack(roi, maxCorners=self.max_corners,
-                                      qualityLevel=self.quality, minDistance=self.min_dist)
+                                      qualityLevel=self.quality, minDistance=self.min_dist,
+                                      mask=mask)
         if pts is None or len(pts) < self.min_points:
             self.prev_pts = None
             return False
@@ -43,6 +63,7 @@ class PatchOpticalFlow:
 
     def step(self, gray, current_rect=None):
         """Track points and return displacement. Optionally refresh points if rect provided."""
+        self.transform = None
         if self.prev_pts is None or self.prev_gray is None:
             return None
         
@@ -55,7 +76,7 @@ class PatchOpticalFlow:
             self.prev_pts = None
             return None
             
-        status = status.reshape(-1)
+        status = status.reshape(-1) * (err.reshape(-1) <= self.max_error)
         good_prev = self.prev_pts[status==1]
         good_next = nextPts[status==1]
         
@@ -86,6 +107,7 @@ class PatchOpticalFlow:
                     dy = np.median(inlier_next[:,0,1] - inlier_prev[:,0,1])
                     # Keep only inliers for next frame
                     self.prev_pts = inlier_next.reshape(-1, 1, 2)
+                    self.transform = M
                 else:
                     dx = np.median(good_next[:,0,0] - good_prev[:,0,0])
                     dy = np.median(good_next[:,0,1] - good_prev[:,0,1])
@@ -110,6 +132,7 @@ class PatchOpticalFlow:
     
     def reset(self):
         """Clear all tracking state"""
+        self.transform = None
         self.prev_pts = None
         self.prev_gray = None
         self.frame_count = 0
\ No newline at end of file
@@ -0,0 +1,271 @@
+import io
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id          TEXT PRIMARY KEY,
+    player      TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_player ON sessions (player, created_at);
+
+CREATE TABLE IF NOT EXISTS uploads (
+    session_id  TEXT NOT NULL REFERENCES sessions (id),
+    video_key   TEXT NOT NULL,
+    job_id      TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    fps         REAL,
+    created_at  REAL NOT NULL,
+    PRIMARY KEY (session_id, video_key)
+);
+
+CREATE TABLE IF NOT EXISTS shots (
+    id                          INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id                  TEXT NOT NULL REFERENCES sessions (id),
+    player                      TEXT,
+    video_key                   TEXT NOT NULL,
+    job_id                      TEXT NOT NULL,
+    kind                        TEXT NOT NULL,
+    shot_index                  INTEGER NOT NULL,
+    start_frame                 INTEGER NOT NULL,
+    end_frame                   INTEGER NOT NULL,
+    start_s                     REAL,
+    end_s                       REAL,
+    fps                         REAL,
+    peak_speed_m_s              REAL,
+    peak_speed_kmh              REAL,
+    mean_speed_m_s              REAL,
+    path_length_m               REAL,
+    peak_angular_velocity_deg_s REAL,
+    swing_arc_deg               REAL,
+    frames_tracked              INTEGER,
+    metrics                     TEXT NOT NULL,
+    trajectory                  BLOB,
+    created_at                  REAL NOT NULL,
+    UNIQUE (session_id, video_key, shot_index)
+);
+CREATE INDEX IF NOT EXISTS shots_session ON shots (session_id, peak_speed_m_s);
+CREATE INDEX IF NOT EXISTS shots_player ON shots (player, peak_speed_m_s);
+
+CREATE TABLE IF NOT EXISTS session_stats (
+    session_id                      TEXT PRIMARY KEY,
+    sessions                        INTEGER,
+    shots                           INTEGER,
+    max_speed_m_s                   REAL,
+    mean_peak_speed_m_s             REAL,
+    max_speed_kmh                   REAL,
+    max_angular_velocity_deg_s      REAL,
+    max_swing_arc_deg               REAL,
+    first_at                        REAL,
+    last_at                         REAL,
+    best_shot_id                    INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS player_stats (
+    player                          TEXT PRIMARY KEY,
+    sessions                        INTEGER,
+    shots                           INTEGER,
+    max_speed_m_s                   REAL,
+    mean_peak_speed_m_s             REAL,
+    max_speed_kmh                   REAL,
+    max_angular_velocity_deg_s      REAL,
+    max_swing_arc_deg               REAL,
+    first_at                        REAL,
+    last_at                         REAL,
+    best_shot_id                    INTEGER
+);
+"""
+
+# Per-shot metrics (utils.metrics.compute_swing_metrics) kept as columns
+METRIC_COLUMNS = (
+    "peak_speed_m_s", "peak_speed_kmh", "mean_speed_m_s", "path_length_m",
+    "peak_angular_velocity_deg_s", "swing_arc_deg", "frames_tracked",
+)
+
+# Same columns, in order, for session_stats and player_stats
+AGGREGATES = """
+    COUNT(DISTINCT session_id),
+    COUNT(*),
+    MAX(peak_speed_m_s),
+    AVG(peak_speed_m_s),
+    MAX(peak_speed_kmh),
+    MAX(peak_angular_velocity_deg_s),
+    MAX(swing_arc_deg),
+    MIN(created_at),
+    MAX(created_at)
+"""
+
+SHOT_FIELDS = (
+    "id", "session_id", "player", "job_id", "kind", "shot_index",
+    "start_frame", "end_frame", "start_s", "end_s", "fps", "metrics", "created_at",
+)
+
+
+def _encode_array(arr):
+    buf = io.BytesIO()
+    np.save(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+
+def _decode_array(blob):
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+
+class SessionStore:
+    """
+    Shot history in SQLite, by session and player.
+
+    Every processed upload's shots (utils.shots: window, swing metrics
+    and trajectory slice) are filed under a session. Session and player
+    aggregates are recomputed in the same transaction as each insert,
+    so history queries read a single row and never touch videos.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        # One short-lived connection per call: callers run in worker threads
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add_upload(self, session_id, player, video_key, job_id, kind, fps, shots,
+                   trajectory=None):
+        """
+        File an upload's shots under session_id (created for `player` on
+        first use; an existing session keeps its player). trajectory is
+        the upload's TRAJECTORY_DTYPE array, indexed by frame. The same
+        video is only filed once per session. Returns the new shot ids.
+        """
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO sessions (id, player, created_at) VALUES (?, ?, ?)",
+                (session_id, player, now)
+            )
+            player = db.execute(
+                "SELECT player FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()["player"]
+
+            cur = db.execute(
+                "INSERT OR IGNORE INTO uploads (session_id, video_key, job_id, kind, fps, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, video_key, job_id, kind, fps, now)
+            )
+            if cur.rowcount == 0:
+                return []
+
+            ids = []
+            for shot in shots:
+                metrics = shot["metrics"]
+                traj = None
+                if trajectory is not None:
+                    traj = _encode_array(trajectory[shot["start"]:shot["end"]])
+                cur = db.execute(
+                    f"""INSERT INTO shots (
+                        session_id, player, video_key, job_id, kind, shot_index,
+                        start_frame, end_frame, start_s, end_s, fps,
+                        {", ".join(METRIC_COLUMNS)}, metrics, trajectory, created_at
+                    ) VALUES ({", ".join("?" * (14 + len(METRIC_COLUMNS)))})""",
+                    (
+                        session_id, player, video_key, job_id, kind, shot["index"],
+                        shot["start"], shot["end"], shot.get("start_s"), shot.get("end_s"), fps,
+                        *(metrics.get(c) for c in METRIC_COLUMNS),
+                        json.dumps(metrics), traj, now,
+                    )
+                )
+                ids.append(cur.lastrowid)
+
+            self._refresh(db, "session_stats", "session_id", session_id)
+            if player is not None:
+                self._refresh(db, "player_stats", "player", player)
+        return ids
+
+    def _refresh(self, db, table, key_column, key):
+        db.execute(
+            f"""INSERT OR REPLACE INTO {table}
+                SELECT ?, {AGGREGATES}, (
+                    SELECT id FROM shots WHERE {key_column} = ?
+                    ORDER BY peak_speed_m_s IS NULL, peak_speed_m_s DESC LIMIT 1
+                )
+                FROM shots WHERE {key_column} = ?""",
+            (key, key, key)
+        )
+
+    # ---- queries ----
+    def _stats(self, table, key_column, key):
+        with self._db() as db:
+            row = db.execute(
+                f"SELECT * FROM {table} WHERE {key_column} = ?", (key,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def session_stats(self, session_id):
+        return self._stats("session_stats", "session_id", session_id)
+
+    def player_stats(self, player):
+        return self._stats("player_stats", "player", player)
+
+    def sessions(self, player=None, limit=50):
+        """Newest sessions first, each with its aggregates"""
+        query = (
+            "SELECT s.id, s.player, s.created_at, st.shots, st.max_speed_m_s, "
+            "st.max_speed_kmh, st.mean_peak_speed_m_s, st.best_shot_id, st.last_at "
+            "FROM sessions s LEFT JOIN session_stats st ON st.session_id = s.id"
+        )
+        args = ()
+        if player is not None:
+            query += " WHERE s.player = ?"
+            args = (player,)
+        query += " ORDER BY s.created_at DESC LIMIT ?"
+        with self._db() as db:
+            return [dict(r) for r in db.execute(query, args + (limit,))]
+
+    def session(self, session_id):
+        """Session row, its aggregates and its shots (no trajectories), or None"""
+        with self._db() as db:
+            row = db.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            shots = db.execute(
+                f"SELECT {', '.join(SHOT_FIELDS)} FROM shots "
+                "WHERE session_id = ? ORDER BY created_at, shot_index",
+                (session_id,)
+            ).fetchall()
+        out = dict(row)
+        out["stats"] = self.session_stats(session_id)
+        out["shots"] = [self._shot_dict(s) for s in shots]
+        return out
+
+    def shot(self, shot_id):
+        """One shot with its trajectory array, or None"""
+        with self._db() as db:
+            row = db.execute(
+                f"SELECT {', '.join(SHOT_FIELDS)}, trajectory FROM shots WHERE id = ?",
+                (shot_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        out = self._shot_dict(row)
+        out["trajectory"] = _decode_array(row["trajectory"]) if row["trajectory"] else None
+        return out
+
+    @staticmethod
+    def _shot_dict(row):
+        out = {k: row[k] for k in SHOT_FIELDS}
+        out["metrics"] = json.loads(out["metrics"])
+        return out
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# Same import roots as the server: backend/ and, for the non_ml
+# modules that import each other as top-level packages, backend/non_ml/
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+for d in (BACKEND_DIR, BACKEND_DIR / "non_ml"):
+    if str(d) not in sys.path:
+        sys.path.insert(0, str(d))
@@ -0,0 +1,44 @@
+import numpy as np
+
+from tracking.adaptive import AdaptiveInterval
+
+
+def test_interval_for_ramps_between_thresholds():
+    a = AdaptiveInterval(max_interval=8, low_motion=4.0, high_motion=20.0)
+    assert a.interval_for(0.0) == 8
+    assert a.interval_for(4.0) == 8
+    assert a.interval_for(8.0) == 6      # 8 - 0.25 * 7
+    assert a.interval_for(16.0) == 3     # 8 - 0.75 * 7
+    assert a.interval_for(20.0) == 1
+    assert a.interval_for(255.0) == 1
+
+    steps = [a.interval_for(m) for m in np.linspace(4.0, 20.0, 33)]
+    assert steps == sorted(steps, reverse=True)
+
+
+def test_interval_for_every_frame():
+    a = AdaptiveInterval(max_interval=1)
+    assert a.interval_for(0.0) == 1
+    assert a.interval_for(10.0) == 1
+
+
+def test_due_on_static_and_moving_frames():
+    a = AdaptiveInterval(max_interval=4, low_motion=4.0, high_motion=20.0)
+    still = np.full((240, 320), 100, np.uint8)
+
+    # First frame always runs the detector
+    assert a.due(still)
+    a.detected()
+
+    # No motion: detector every max_interval frames
+    due = [a.due(still) for _ in range(4)]
+    assert due == [False, False, False, True]
+    assert a.motion == 0.0
+    a.detected()
+
+    # A bright block appearing is large motion: due on the next frame
+    moved = still.copy()
+    moved[80:160, 120:200] = 250
+    assert a.due(moved)
+    assert a.motion >= 20.0
+    assert a.interval == 1
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import SwingClip
+from pipeline_non_ml import BatTracker
+
+
+class _TexturedSwing(SwingClip):
+    """SwingClip with grain on the bat, so LK flow has corners to follow"""
+
+    def frame(self, i):
+        out = super().frame(i)
+        (cx, cy), (length, thickness), angle = self.truth[i]
+        u = np.array([np.cos(np.radians(angle)), np.sin(np.radians(angle))])
+        v = np.array([-u[1], u[0]])
+        rng = np.random.default_rng(1)
+        for a, b in zip(rng.uniform(-0.45, 0.45, 40), rng.uniform(-0.3, 0.3, 40)):
+            p = np.array([cx, cy]) + u * a * length + v * b * thickness
+            cv2.circle(out, tuple(p.astype(int)), 1, (50, 125, 180), -1)
+        return out
+
+
+def _run(clip, **options):
+    tracker = BatTracker(**options)
+    modes, centres = [], {}
+    for i, frame in enumerate(clip.frames()):
+        result = tracker.process(frame)
+        modes.append(result["mode"])
+        if result["rect"] is not None:
+            centres[i] = np.array(result["rect"][0])
+    return modes, centres
+
+
+@pytest.fixture(scope="module")
+def clip():
+    return _TexturedSwing(1280, 720, 30, seconds=3.0)
+
+
+@pytest.fixture(scope="module")
+def detected(clip):
+    return _run(clip)
+
+
+@pytest.fixture(scope="module")
+def tracked(clip):
+    return _run(clip, track=True)
+
+
+def test_track_mode_follows_the_detector(detected, tracked):
+    _, det = detected
+    modes, trk = tracked
+    assert "TRACK" in modes      # flow did carry some frames
+
+    common = sorted(set(det) & set(trk))
+    assert len(common) >= 10
+    err = [np.hypot(*(trk[i] - det[i])) for i in common]
+    assert max(err) <= 3.0
+
+
+def test_track_mode_drops_to_lost_once_the_bat_stops(tracked):
+    modes, _ = tracked
+    last_detect = max(i for i, m in enumerate(modes) if m == "DETECT")
+    redetect = BatTracker().redetect_interval
+
+    # No frame is tracked more than redetect_interval past a detection
+    assert all(m != "TRACK" for m in modes[last_detect + redetect + 1:])
+    assert "LOST" in modes[last_detect:last_detect + redetect + 2]
+    assert modes[-1] == "IDLE"
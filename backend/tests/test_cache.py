@@ -0,0 +1,63 @@
+import os
+
+from cache import ResultCache, RESULT_FILE
+
+
+def _entry(cache, key, size, source_size=0, mtime=None):
+    entry = cache.entry_dir(key)
+    entry.mkdir(parents=True, exist_ok=True)
+    (entry / "out.bin").write_bytes(b"x" * size)
+    if source_size:
+        cache.private_dir(key).mkdir(parents=True, exist_ok=True)
+        (cache.private_dir(key) / "source.mp4").write_bytes(b"x" * source_size)
+    cache.put(key, {"key": key})
+    if mtime is not None:
+        os.utime(entry / RESULT_FILE, (mtime, mtime))
+
+
+def test_key_depends_on_video_kind_and_params(tmp_path):
+    cache = ResultCache(tmp_path, 1 << 20)
+    key = cache.key("abc", "ml", {"a": 1, "b": 2})
+    assert key == cache.key("abc", "ml", {"b": 2, "a": 1})
+    assert key != cache.key("abd", "ml", {"a": 1, "b": 2})
+    assert key != cache.key("abc", "non_ml", {"a": 1, "b": 2})
+    assert key != cache.key("abc", "ml", {"a": 1, "b": 3})
+
+
+def test_put_get_discard(tmp_path):
+    cache = ResultCache(tmp_path / "out", 1 << 20, private_root=tmp_path / "kept")
+    assert cache.get("k") is None
+    _entry(cache, "k", 10, source_size=10)
+    assert cache.get("k") == {"key": "k"}
+
+    cache.discard("k")
+    assert cache.get("k") is None
+    assert not cache.private_dir("k").exists()
+
+
+def test_lru_eviction_counts_private_files(tmp_path):
+    cache = ResultCache(tmp_path / "out", 2300, private_root=tmp_path / "kept")
+    _entry(cache, "old", 100, source_size=1000, mtime=1000)
+    _entry(cache, "used", 100, source_size=1000, mtime=2000)
+
+    # Reading marks "used" recently used; the next put goes over budget
+    # only because of the kept sources
+    cache.get("used")
+    _entry(cache, "new", 100)
+
+    assert cache.get("old") is None
+    assert not cache.private_dir("old").exists()
+    assert cache.get("used") is not None
+    assert cache.private_dir("used").exists()
+    assert cache.get("new") is not None
+
+
+def test_eviction_skips_entries_in_progress(tmp_path):
+    cache = ResultCache(tmp_path, 100)
+    busy = cache.entry_dir("busy")
+    busy.mkdir()
+    (busy / "part.mp4").write_bytes(b"x" * 1000)   # no result.json yet
+    _entry(cache, "done", 10)
+
+    assert busy.exists()
+    assert cache.get("done") is not None
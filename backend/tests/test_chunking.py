@@ -0,0 +1,61 @@
+import numpy as np
+
+from utils.chunking import plan_chunks, reconcile_track_ids
+from utils.tracks import DETECTION_DTYPE
+
+
+def test_plan_chunks_covers_video():
+    chunks = plan_chunks(1000, 4, overlap=30, min_chunk_frames=100)
+    assert [c["start"] for c in chunks] == [0, 250, 500, 750]
+    assert [c["end"] for c in chunks] == [250, 500, 750, None]
+    assert [c["warmup"] for c in chunks] == [0, 30, 30, 30]
+    assert [c["index"] for c in chunks] == [0, 1, 2, 3]
+
+
+def test_plan_chunks_respects_min_chunk_frames():
+    chunks = plan_chunks(500, 8, overlap=30, min_chunk_frames=200)
+    assert len(chunks) == 2
+    assert plan_chunks(150, 8, min_chunk_frames=200) == [
+        {"index": 0, "start": 0, "end": None, "warmup": 0}
+    ]
+
+
+def test_plan_chunks_unknown_length():
+    assert plan_chunks(0, 4) == [{"index": 0, "start": 0, "end": None, "warmup": 0}]
+
+
+def _dets(rows):
+    """rows of (frame, track_id, x)"""
+    out = np.zeros(len(rows), DETECTION_DTYPE)
+    for i, (frame, tid, x) in enumerate(rows):
+        out[i] = (frame, tid, x, 100.0, 20.0, 80.0, 0.9)
+    return out
+
+
+def test_reconcile_track_ids_matches_across_overlap():
+    chunks = [{"index": 0, "start": 0, "end": 10, "warmup": 0},
+              {"index": 1, "start": 10, "end": None, "warmup": 5}]
+    # Same bat moving right; the second chunk's tracker calls it 7, and
+    # a second bat (8) appears only after the overlap
+    first = _dets([(f, 3, 10.0 * f) for f in range(10)])
+    second = _dets([(f, 7, 10.0 * f) for f in range(5, 20)]
+                   + [(f, 8, 400.0) for f in range(15, 20)])
+
+    merged = reconcile_track_ids([first, second], chunks)
+
+    assert np.all(np.diff(merged["frame"][merged["track_id"] == 0]) == 1)
+    assert len(merged) == 10 + 10 + 5            # warm-up rows dropped
+    assert set(merged["track_id"][merged["x"] < 400]) == {0}
+    assert set(merged["track_id"][merged["x"] == 400]) == {1}
+
+
+def test_reconcile_track_ids_no_match_gets_fresh_id():
+    chunks = [{"index": 0, "start": 0, "end": 10, "warmup": 0},
+              {"index": 1, "start": 10, "end": None, "warmup": 5}]
+    first = _dets([(f, 0, 0.0) for f in range(10)])
+    second = _dets([(f, 0, 300.0) for f in range(5, 20)])
+
+    merged = reconcile_track_ids([first, second], chunks)
+
+    assert set(merged["track_id"][merged["frame"] < 10]) == {0}
+    assert set(merged["track_id"][merged["frame"] >= 10]) == {1}
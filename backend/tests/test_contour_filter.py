@@ -0,0 +1,35 @@
+import cv2
+import numpy as np
+import pytest
+
+from geometry.contour_filter import contour_areas
+
+
+def _random_contours(rng, n):
+    contours = []
+    for _ in range(n):
+        k = int(rng.integers(1, 40))
+        contours.append(rng.integers(0, 500, size=(k, 1, 2)).astype(np.int32))
+    return contours
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_contour_areas_match_cv2(seed):
+    contours = _random_contours(np.random.default_rng(seed), 50)
+    expected = [cv2.contourArea(c) for c in contours]
+    np.testing.assert_allclose(contour_areas(contours), expected)
+
+
+def test_contour_areas_degenerate():
+    contours = [
+        np.array([[[3, 4]]], np.int32),                      # 1 point
+        np.array([[[0, 0]], [[10, 5]]], np.int32),           # 2 points
+        np.array([[[0, 0]], [[10, 0]], [[10, 10]], [[0, 10]]], np.int32),
+    ]
+    np.testing.assert_allclose(contour_areas(contours), [0.0, 0.0, 100.0])
+    np.testing.assert_allclose(contour_areas(contours),
+                               [cv2.contourArea(c) for c in contours])
+
+
+def test_contour_areas_empty():
+    assert contour_areas([]).shape == (0,)
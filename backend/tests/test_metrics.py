@@ -0,0 +1,45 @@
+import numpy as np
+
+from utils.metrics import compute_swing_metrics, BAT_LENGTH_M
+
+
+def _trajectory(n=10, gap=(4, 5)):
+    """Bat moving 10 px/frame to the right, turning 5 deg/frame through the
+    +-90 deg wrap of PCA angles; 100 px per metre; frames in `gap` missing"""
+    i = np.arange(n, dtype=float)
+    traj = {
+        "cx": 10.0 * i,
+        "cy": np.zeros(n),
+        "angle": (80.0 + 5.0 * i + 90.0) % 180.0 - 90.0,
+        "length": np.full(n, 100.0 * BAT_LENGTH_M),
+    }
+    for name in traj:
+        traj[name][list(gap)] = np.nan
+    return traj
+
+
+def test_compute_swing_metrics_linear_with_gap_and_wrap():
+    m = compute_swing_metrics(_trajectory(), fps=30)
+
+    assert m["frames_tracked"] == 8
+    # 10 px/frame at 30 fps, also across the gap (30 px over 3 frames)
+    assert m["peak_speed_px_s"] == 300.0
+    assert m["peak_speed_m_s"] == 3.0
+    assert m["peak_speed_kmh"] == 10.8
+    assert m["mean_speed_m_s"] == 3.0
+    assert m["path_length_m"] == 0.9
+    assert m["peak_speed_frame"] in (1, 2, 3, 6, 7, 8, 9)   # equal speeds: any step end
+    # 80 -> 85 -> -90 -> ... is a steady 5 deg/frame, not a 175 deg flip
+    assert m["peak_angular_velocity_deg_s"] == 150.0
+    assert m["swing_arc_deg"] == 45.0
+
+
+def test_compute_swing_metrics_too_few_points():
+    traj = _trajectory(n=3, gap=(1, 2))
+    m = compute_swing_metrics(traj, fps=30)
+    assert m["frames_tracked"] == 1
+    assert m["peak_speed_m_s"] is None and m["swing_arc_deg"] is None
+
+
+def test_compute_swing_metrics_default_fps():
+    assert compute_swing_metrics(_trajectory(), fps=0) == compute_swing_metrics(_trajectory(), fps=30)
@@ -0,0 +1,82 @@
+import numpy as np
+
+from session_store import SessionStore
+from utils.tracks import TRAJECTORY_DTYPE
+
+
+def _shot(index, start, end, peak):
+    return {
+        "index": index, "start": start, "end": end,
+        "start_s": start / 30, "end_s": end / 30,
+        "metrics": {"peak_speed_m_s": peak, "peak_speed_kmh": peak * 3.6,
+                    "swing_arc_deg": 90.0, "frames_tracked": end - start},
+    }
+
+
+def _trajectory(n):
+    traj = np.zeros(n, TRAJECTORY_DTYPE)
+    traj["cx"] = np.arange(n)
+    traj["cy"] = np.nan
+    return traj
+
+
+def test_session_and_player_aggregates(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+
+    ids = store.add_upload("s1", "ann", "v1", "job1", "ml", 30.0,
+                           [_shot(0, 0, 10, 20.0), _shot(1, 20, 30, 10.0)],
+                           trajectory=_trajectory(40))
+    assert len(ids) == 2
+    store.add_upload("s2", "ann", "v2", "job2", "non_ml", 30.0, [_shot(0, 5, 15, 30.0)])
+
+    s1 = store.session_stats("s1")
+    assert s1["shots"] == 2
+    assert s1["max_speed_m_s"] == 20.0
+    assert s1["mean_peak_speed_m_s"] == 15.0
+    assert s1["best_shot_id"] == ids[0]
+
+    ann = store.player_stats("ann")
+    assert ann["sessions"] == 2
+    assert ann["shots"] == 3
+    assert ann["max_speed_m_s"] == 30.0
+    assert ann["mean_peak_speed_m_s"] == 20.0
+    assert ann["best_shot_id"] == store.session("s2")["shots"][0]["id"]
+
+    assert [s["id"] for s in store.sessions(player="ann")] == ["s2", "s1"]
+    assert store.sessions(player="bob") == []
+    assert store.session_stats("nope") is None and store.session("nope") is None
+
+
+def test_same_video_filed_once_per_session(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+    shots = [_shot(0, 0, 10, 20.0)]
+
+    assert len(store.add_upload("s1", "ann", "v1", "job1", "ml", 30.0, shots)) == 1
+    assert store.add_upload("s1", "ann", "v1", "job2", "ml", 30.0, shots) == []
+    assert store.session_stats("s1")["shots"] == 1
+
+    # Another session may file the same video; an existing session keeps its player
+    assert len(store.add_upload("s2", "bob", "v1", "job3", "ml", 30.0, shots)) == 1
+    assert len(store.add_upload("s2", "eve", "v2", "job4", "ml", 30.0, shots)) == 1
+    assert store.session("s2")["player"] == "bob"
+    assert store.player_stats("bob")["shots"] == 2
+    assert store.player_stats("eve") is None
+
+
+def test_shot_keeps_trajectory_slice(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+    traj = _trajectory(40)
+    [sid] = store.add_upload("s1", None, "v1", "job1", "ml", 30.0,
+                             [_shot(0, 20, 30, 12.0)], trajectory=traj)
+    [no_traj] = store.add_upload("s1", None, "v2", "job2", "ml", 30.0, [_shot(0, 0, 5, 8.0)])
+
+    shot = store.shot(sid)
+    assert shot["start_frame"] == 20 and shot["end_frame"] == 30
+    assert shot["metrics"]["peak_speed_m_s"] == 12.0
+    assert shot["trajectory"].dtype == TRAJECTORY_DTYPE
+    np.testing.assert_array_equal(shot["trajectory"]["cx"], np.arange(20, 30))
+    assert np.isnan(shot["trajectory"]["cy"]).all()
+
+    assert store.shot(no_traj)["trajectory"] is None
+    assert store.shot(999) is None
+    assert store.player_stats(None) is None
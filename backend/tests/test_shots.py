@@ -0,0 +1,52 @@
+import numpy as np
+
+from utils.shots import find_shots, PAD_S
+
+FPS = 30.0
+STRIDE = 3
+
+
+def _series(bursts, n=600, seed=0):
+    """motion_energy-like series: low noise plus (first, last) sample bursts"""
+    rng = np.random.default_rng(seed)
+    frames = np.arange(1, n + 1) * STRIDE
+    energy = 0.0005 + rng.normal(0, 0.0001, n).clip(-0.0004, 0.0004)
+    for first, last in bursts:
+        energy[first:last + 1] = 0.05
+    return frames, energy
+
+
+def test_find_shots_pads_and_indexes():
+    frames, energy = _series([(100, 109), (300, 305)])
+    shots = find_shots(frames, energy, STRIDE, FPS, total_frames=len(frames) * STRIDE)
+
+    pad = int(round(PAD_S * FPS))
+    assert [s["index"] for s in shots] == [0, 1]
+    assert shots[0]["start"] == frames[100] - STRIDE - pad
+    assert shots[0]["end"] == frames[109] + 1 + pad
+    assert all(s["warmup"] == 0 and s["peak_energy"] == 0.05 for s in shots)
+
+
+def test_find_shots_merges_close_bursts_and_drops_blips():
+    # 0.5 s apart -> one shot; a single-sample blip is under MIN_ACTIVE_S
+    frames, energy = _series([(200, 205), (210, 215), (500, 500)])
+    shots = find_shots(frames, energy, STRIDE, FPS, total_frames=len(frames) * STRIDE)
+
+    assert len(shots) == 1
+    assert shots[0]["start"] < frames[200] - STRIDE
+    assert shots[0]["end"] > frames[215]
+
+
+def test_find_shots_clamps_to_video():
+    frames, energy = _series([(0, 10), (590, 599)])
+    total = len(frames) * STRIDE
+    shots = find_shots(frames, energy, STRIDE, FPS, total_frames=total)
+
+    assert shots[0]["start"] == 0
+    assert shots[-1]["end"] == total
+
+
+def test_find_shots_quiet_or_empty():
+    frames, energy = _series([])
+    assert find_shots(frames, energy, STRIDE, FPS, total_frames=1800) == []
+    assert find_shots(np.empty(0, np.int64), np.empty(0), STRIDE, FPS, 0) == []
@@ -0,0 +1,71 @@
+import numpy as np
+
+from utils.tracks import (
+    ColumnBuffer, DETECTION_DTYPE, MODES, records_to_frame_states,
+    save_tracks, load_tracks, to_columns,
+)
+
+
+def _records():
+    return [
+        {"frame": 0, "mode": "IDLE", "confidence": None, "rect": None,
+         "angle": None, "smoothed": None},
+        {"frame": 1, "mode": "DETECT", "confidence": 0.8,
+         "rect": [[100.0, 50.0], [20.0, 200.0], 30.0], "angle": 120.0,
+         "smoothed": [101.0, 51.0]},
+        {"frame": 2, "mode": "TRACK", "confidence": 0.5,
+         "rect": [[110.0, 60.0], [20.0, 200.0], 35.0], "angle": 125.0,
+         "smoothed": None},
+        {"frame": 3, "mode": "BOGUS", "confidence": 0.0, "rect": None,
+         "angle": None, "smoothed": None},
+    ]
+
+
+def test_records_to_frame_states():
+    states = records_to_frame_states(_records())
+    np.testing.assert_array_equal(states["frame"], [0, 1, 2, 3])
+    np.testing.assert_array_equal(
+        states["mode"], [MODES.index("IDLE"), MODES.index("DETECT"), MODES.index("TRACK"), -1]
+    )
+    np.testing.assert_allclose(states["confidence"], [0.0, 0.8, 0.5, 0.0], rtol=1e-6)
+    np.testing.assert_allclose(states["cx"], [np.nan, 100.0, 110.0, np.nan])
+    np.testing.assert_allclose(states["h"], [np.nan, 200.0, 200.0, np.nan])
+    np.testing.assert_allclose(states["rect_angle"], [np.nan, 30.0, 35.0, np.nan])
+    np.testing.assert_allclose(states["angle"], [np.nan, 120.0, 125.0, np.nan])
+    np.testing.assert_allclose(states["smooth_x"], [np.nan, 101.0, np.nan, np.nan])
+
+
+def test_records_to_frame_states_empty():
+    states = records_to_frame_states([])
+    assert len(states) == 0
+
+
+def test_save_load_to_columns_round_trip(tmp_path):
+    dets = np.zeros(2, DETECTION_DTYPE)
+    dets["frame"] = [4, 5]
+    dets["x"] = [1.5, 2.5]
+    states = records_to_frame_states(_records())
+
+    path = save_tracks(tmp_path / "tracks.npz", 30.0, detections=dets, frames=states)
+    tracks = load_tracks(path)
+    assert float(tracks["fps"]) == 30.0
+    np.testing.assert_array_equal(tracks["detections"], dets)
+    np.testing.assert_array_equal(tracks["frames"]["frame"], states["frame"])
+
+    cols = to_columns(tracks)
+    assert cols["fps"] == 30.0
+    assert cols["detections"]["frame"] == [4, 5]
+    assert cols["detections"]["x"] == [1.5, 2.5]
+    assert cols["frames"]["cx"] == [None, 100.0, 110.0, None]
+    assert cols["frames"]["smooth_y"] == [None, 51.0, None, None]
+    assert cols["frames"]["mode"] == [0, 1, 2, -1]
+
+
+def test_column_buffer_grows():
+    buf = ColumnBuffer(DETECTION_DTYPE, capacity=2)
+    buf.extend(frame=np.arange(3), track_id=-1, x=0, y=0, w=1, h=1, confidence=0.5)
+    buf.extend(frame=[3], track_id=[7], x=[1], y=[1], w=[1], h=[1], confidence=[0.9])
+    arr = buf.array()
+    assert len(buf) == 4
+    np.testing.assert_array_equal(arr["frame"], [0, 1, 2, 3])
+    np.testing.assert_array_equal(arr["track_id"], [-1, -1, -1, 7])
@@ -0,0 +1,26 @@
+import pytest
+
+from upload_stream import sniff_container
+
+
+@pytest.mark.parametrize("head, container", [
+    (b"\x00\x00\x00\x20ftypisom\x00\x00\x02\x00", "mp4"),
+    (b"\x00\x00\x00\x14ftypqt  \x20\x05\x03\x00", "mp4"),
+    (b"\x00\x00\x00\x08wide\x00\x01\x02\x03", "mov"),
+    (b"\x00\x01\x02\x03mdat", "mov"),
+    (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81", "matroska"),
+    (b"RIFF\x24\x10\x00\x00AVI LIST", "avi"),
+])
+def test_sniff_container_known(head, container):
+    assert sniff_container(head) == container
+
+
+@pytest.mark.parametrize("head", [
+    b"",
+    b"\x00\x00\x00\x20ftyp",          # too short for a brand
+    b"RIFF\x24\x10\x00\x00WAVEfmt ",  # RIFF but not AVI
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d",
+    b"not a video at all",
+])
+def test_sniff_container_rejects(head):
+    assert sniff_container(head) is None
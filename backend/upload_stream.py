@@ -0,0 +1,185 @@
+import os
+import asyncio
+import hashlib
+from pathlib import Path
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+# Top-level atoms older QuickTime files may start with instead of ftyp
+QUICKTIME_ATOMS = (b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot")
+
+# Request bytes handed to the parser (and so to disk) per worker-thread hop
+WRITE_BYTES = 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def sniff_container(head):
+    """Container type from the first bytes of a file, or None"""
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        return "mp4"            # mp4 / mov
+    if len(head) >= 8 and head[4:8] in QUICKTIME_ATOMS:
+        return "mov"            # pre-ftyp QuickTime
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "matroska"       # mkv / webm
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    return None
+
+
+class _VideoPartWriter:
+    """
+    multipart callbacks that write one file field straight to disk,
+    hashing and size-checking every chunk as it arrives.
+    """
+
+    SNIFF_BYTES = 16
+
+    def __init__(self, field, dest_stem, allowed_ext, max_bytes):
+        self.field = field
+        self.dest_stem = str(dest_stem)
+        self.allowed_ext = allowed_ext
+        self.max_bytes = max_bytes
+
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.path = None
+        self.filename = None
+        self.container = None
+
+        self._headers = {}
+        self._name = b""
+        self._value = b""
+        self._file = None
+        self._active = False
+        self._head = b""
+
+    # ---- headers ----
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._name.lower()] = self._value
+        self._name = b""
+        self._value = b""
+
+    def on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = params.get(b"name", b"").decode(errors="replace")
+        filename = params.get(b"filename")
+
+        self._active = name == self.field and filename is not None and self._file is None
+        if not self._active:
+            return
+
+        self.filename = Path(filename.decode(errors="replace")).name
+        ext = Path(self.filename).suffix.lower()
+        if ext not in self.allowed_ext:
+            raise UploadError(400, "Invalid video format")
+
+        self.path = self.dest_stem + ext
+        self._file = open(self.path, "wb")
+
+    # ---- body ----
+    def on_part_data(self, data, start, end):
+        if not self._active:
+            return
+
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadError(413, "Video too large")
+
+        # Reject non-video bytes before writing the rest of the upload
+        if self.container is None:
+            self._head += chunk[:self.SNIFF_BYTES]
+            if len(self._head) >= self.SNIFF_BYTES:
+                self.container = sniff_container(self._head)
+                if self.container is None:
+                    raise UploadError(400, "Not a supported video container")
+
+        self.sha.update(chunk)
+        self._file.write(chunk)
+
+    def on_part_end(self):
+        if self._active:
+            self._file.close()
+            self._active = False
+
+    def finish(self):
+        if self.path is None:
+            raise UploadError(400, f"Missing '{self.field}' file field")
+        if self.container is None:
+            # Upload shorter than SNIFF_BYTES
+            self.container = sniff_container(self._head)
+            if self.container is None:
+                raise UploadError(400, "Not a supported video container")
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def abort(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def receive_video(request, dest_stem, allowed_ext, max_bytes, field="video"):
+    """
+    Stream the `field` file of a multipart/form-data request directly to
+    `dest_stem` + its extension, without spooling it first.
+
+    Returns (path, filename, sha256 hex, size). Raises UploadError with
+    an HTTP status on bad or oversized input; nothing is left on disk.
+    """
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise UploadError(400, "Expected multipart/form-data upload")
+
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_bytes + 64 * 1024:
+        raise UploadError(413, "Video too large")
+
+    writer = _VideoPartWriter(field, dest_stem, allowed_ext, max_bytes)
+    parser = MultipartParser(boundary, writer.callbacks())
+
+    # Parsing, hashing and disk writes run in a worker thread, a
+    # megabyte at a time, so large uploads don't block the event loop
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            pending += chunk
+            if len(pending) >= WRITE_BYTES:
+                await asyncio.to_thread(parser.write, bytes(pending))
+                pending.clear()
+        if pending:
+            await asyncio.to_thread(parser.write, bytes(pending))
+        parser.finalize()
+        writer.finish()
+    except Exception:
+        writer.abort()
+        raise
+
+    return writer.path, writer.filename, writer.sha.hexdigest(), writer.size
@@ -0,0 +1,172 @@
+# chunking.py
+# Split a video into frame-range chunks and stitch the results back
+
+import os
+import numpy as np
+
+from utils.tracks import empty_detections
+from utils.metrics import trajectory_from_detections, compute_swing_metrics
+from utils.shots import shot_summary, best_shot
+
+
+def plan_chunks(total_frames, n_chunks, overlap=0, min_chunk_frames=300):
+    """
+    Split [0, total_frames) into at most n_chunks ranges of at least
+    min_chunk_frames. Each chunk after the first starts `overlap`
+    frames early to warm up tracker state; those frames are not output.
+    The last chunk has end=None so it reads to the real end of the
+    video (CAP_PROP_FRAME_COUNT is only an estimate).
+    """
+    if total_frames <= 0:
+        return [{"index": 0, "start": 0, "end": None, "warmup": 0}]
+
+    n = max(1, min(n_chunks, total_frames // max(1, min_chunk_frames)))
+    size = -(-total_frames // n)  # ceil
+
+    chunks = []
+    for i in range(n):
+        start = i * size
+        chunks.append({
+            "index": i,
+            "start": start,
+            "end": None if i == n - 1 else min(total_frames, start + size),
+            "warmup": min(overlap, start),
+        })
+    return chunks
+
+
+def _iou(box, others):
+    """IoU of one detection row against an array of detection rows"""
+    iw = np.minimum(box["x"] + box["w"], others["x"] + others["w"]) - np.maximum(box["x"], others["x"])
+    ih = np.minimum(box["y"] + box["h"], others["y"] + others["h"]) - np.maximum(box["y"], others["y"])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    union = box["w"] * box["h"] + others["w"] * others["h"] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+def reconcile_track_ids(chunk_detections, chunks, min_iou=0.3):
+    """
+    Merge per-chunk detection arrays (absolute frame numbers) into one
+    array in frame order with consistent track ids.
+
+    A chunk's warm-up detections overlap the previous chunk's last
+    frames; matching them by IoU maps the chunk's ids onto the
+    previous chunk's. Unmatched ids get fresh ids. Warm-up detections
+    are dropped from the output.
+    """
+    merged = []
+    next_id = 0
+    prev = empty_detections()  # previous chunk's detections after remapping
+
+    for dets, chunk in zip(chunk_detections, chunks):
+        start = chunk["start"]
+
+        # Vote: chunk-local id -> previous id, over the overlap frames
+        votes = {}
+        if chunk["warmup"] and len(prev):
+            overlap = prev[(prev["frame"] >= start - chunk["warmup"]) & (prev["track_id"] != -1)]
+            warm = dets[(dets["frame"] < start) & (dets["track_id"] != -1)]
+
+            for d in warm:
+                cands = overlap[overlap["frame"] == d["frame"]]
+                if not len(cands):
+                    continue
+                iou = _iou(d, cands)
+                best = int(np.argmax(iou))
+                if iou[best] >= min_iou:
+                    key = (int(d["track_id"]), int(cands["track_id"][best]))
+                    votes[key] = votes.get(key, 0) + 1
+
+        id_map = {}
+        taken = set()
+        for (local, target), _ in sorted(votes.items(), key=lambda kv: -kv[1]):
+            if local not in id_map and target not in taken:
+                id_map[local] = target
+                taken.add(target)
+
+        current = dets[dets["frame"] >= start].copy()
+        ids = current["track_id"]
+
+        # Fresh ids in order of first appearance, as a per-row loop would
+        local_ids, first = np.unique(ids[ids != -1], return_index=True)
+        for tid in local_ids[np.argsort(first)]:
+            tid = int(tid)
+            if tid not in id_map:
+                id_map[tid] = next_id
+            next_id = max(next_id, id_map[tid] + 1)
+
+        if id_map:
+            tracked = ids != -1
+            ids[tracked] = [id_map[int(t)] for t in ids[tracked]]
+
+        merged.append(current)
+        prev = current
+
+    return np.concatenate(merged) if merged else empty_detections()
+
+
+def remove_parts(paths):
+    for p in paths:
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def merge_ml_chunk_results(results, chunks):
+    """Combine MLBatPipeline.process_video results of consecutive chunks"""
+    detections = reconcile_track_ids([r["detections"] for r in results], chunks)
+    unique_tracks = len(np.unique(detections["track_id"][detections["track_id"] != -1]))
+
+    total_frames = sum(r["total_frames"] for r in results)
+    trajectory = trajectory_from_detections(detections, total_frames)
+    metrics = compute_swing_metrics(trajectory, results[0]["fps"])
+
+    return {
+        "total_frames": total_frames,
+        "total_detections": len(detections),
+        "unique_bats": unique_tracks,
+        "metrics": metrics,
+        "fps": results[0]["fps"],
+        "batch_size": results[0]["batch_size"],
+        "frames_interpolated": sum(r.get("frames_interpolated", 0) for r in results),
+        "chunks": len(results),
+        "detections": detections,
+        "trajectory": trajectory,
+    }
+
+
+def merge_ml_shot_results(results, shots, fps):
+    """
+    Combine MLBatPipeline.process_video results of separate shot windows
+    (utils.shots.find_shots). Shots share no frames, so every shot's
+    tracks get fresh ids; top-level metrics are the fastest shot's.
+    """
+    detections = reconcile_track_ids([r["detections"] for r in results], shots)
+    unique_tracks = len(np.unique(detections["track_id"][detections["track_id"] != -1]))
+
+    shot_results = []
+    for r, shot in zip(results, shots):
+        traj = trajectory_from_detections(
+            r["detections"], shot["end"] - shot["start"], frame_offset=shot["start"]
+        )
+        shot_results.append(shot_summary(shot, traj, fps))
+
+    trajectory = trajectory_from_detections(detections)
+    best = best_shot(shot_results)
+    if best is not None:
+        metrics = shot_results[best]["metrics"]
+    else:
+        metrics = compute_swing_metrics(trajectory, fps)
+
+    return {
+        "total_frames": sum(r["total_frames"] for r in results),
+        "total_detections": len(detections),
+        "unique_bats": unique_tracks,
+        "metrics": metrics,
+        "shots": shot_results,
+        "best_shot": best,
+        "fps": fps,
+        "frames_interpolated": sum(r.get("frames_interpolated", 0) for r in results),
+        "chunks": len(results),
+        "detections": detections,
+        "trajectory": trajectory,
+    }
@@ -0,0 +1,128 @@
+# metrics.py
+# Bat speed / swing-angle metrics from a tracked trajectory.
+# Everything is whole-array NumPy math: O(frames), no per-frame Python loop.
+
+import numpy as np
+
+# Standard full-size bat (38 in), used to turn pixels into metres
+BAT_LENGTH_M = 0.965
+
+
+def trajectory_from_records(records, n_frames=None, frame_offset=0):
+    """
+    Arrays (NaN where the bat was not found) from non-ML per-frame records
+    (see pipeline_non_ml.result_to_record). Kalman-smoothed centres are
+    used when present. Index i is frame frame_offset + i.
+    """
+    if n_frames is None:
+        n_frames = (records[-1]["frame"] + 1 - frame_offset) if records else 0
+    cx = np.full(n_frames, np.nan)
+    cy = np.full(n_frames, np.nan)
+    angle = np.full(n_frames, np.nan)
+    length = np.full(n_frames, np.nan)
+
+    found = [r for r in records
+             if r.get("rect") is not None and 0 <= r["frame"] - frame_offset < n_frames]
+    if not found:
+        return {"cx": cx, "cy": cy, "angle": angle, "length": length}
+
+    idx = np.array([r["frame"] for r in found]) - frame_offset
+    centres = np.array([r.get("smoothed") or r["rect"][0] for r in found], dtype=float)
+    sizes = np.array([r["rect"][1] for r in found], dtype=float)
+    angles = np.array([np.nan if r.get("angle") is None else r["angle"] for r in found],
+                      dtype=float)
+
+    cx[idx] = centres[:, 0]
+    cy[idx] = centres[:, 1]
+    length[idx] = sizes.max(axis=1)
+    angle[idx] = angles
+    return {"cx": cx, "cy": cy, "angle": angle, "length": length}
+
+
+def trajectory_from_detections(detections, n_frames=None, frame_offset=0):
+    """
+    Arrays from ML detections (utils.tracks.DETECTION_DTYPE rows).
+    Keeps the most confident box per frame; boxes carry no orientation.
+    """
+    frames = detections["frame"].astype(np.int64) - frame_offset
+    if n_frames is None:
+        n_frames = int(frames.max()) + 1 if len(frames) else 0
+    cx = np.full(n_frames, np.nan)
+    cy = np.full(n_frames, np.nan)
+    length = np.full(n_frames, np.nan)
+    angle = np.full(n_frames, np.nan)
+
+    keep = (frames >= 0) & (frames < n_frames)
+    frames, dets = frames[keep], detections[keep]
+    if not len(dets):
+        return {"cx": cx, "cy": cy, "angle": angle, "length": length}
+
+    # Ascending confidence: fancy assignment keeps the last (= best) per frame
+    order = np.argsort(dets["confidence"], kind="stable")
+    frames, dets = frames[order], dets[order]
+
+    cx[frames] = dets["x"] + dets["w"] / 2
+    cy[frames] = dets["y"] + dets["h"] / 2
+    length[frames] = np.hypot(dets["w"], dets["h"])
+    return {"cx": cx, "cy": cy, "angle": angle, "length": length}
+
+
+def _round(x, nd=2):
+    return None if x is None or not np.isfinite(x) else round(float(x), nd)
+
+
+def compute_swing_metrics(traj, fps, bat_length_m=BAT_LENGTH_M):
+    """
+    Speed, angular velocity, swing arc and peak values over a whole
+    trajectory. Gaps are bridged: rates use the real time between the
+    two valid frames either side of a gap.
+    """
+    cx, cy, angle, length = traj["cx"], traj["cy"], traj["angle"], traj["length"]
+    fps = float(fps) if fps and fps > 0 else 30.0
+
+    valid = np.flatnonzero(np.isfinite(cx) & np.isfinite(cy))
+    metrics = {
+        "frames_tracked": int(valid.size),
+        "peak_speed_px_s": None,
+        "peak_speed_m_s": None,
+        "peak_speed_kmh": None,
+        "mean_speed_m_s": None,
+        "peak_speed_frame": None,
+        "path_length_m": None,
+        "peak_angular_velocity_deg_s": None,
+        "swing_arc_deg": None,
+    }
+    if valid.size < 2:
+        return metrics
+
+    # ---- LINEAR SPEED ----
+    t = valid / fps
+    dt = np.diff(t)
+    step = np.hypot(np.diff(cx[valid]), np.diff(cy[valid]))
+    speed_px = step / dt
+
+    # Pixel scale from the bat's own apparent length
+    px_per_m = np.nanmedian(length[valid]) / bat_length_m if np.isfinite(length[valid]).any() else np.nan
+    speed_m = speed_px / px_per_m
+
+    peak = int(np.argmax(speed_px))
+    metrics.update({
+        "peak_speed_px_s": _round(speed_px[peak]),
+        "peak_speed_m_s": _round(speed_m[peak]),
+        "peak_speed_kmh": _round(speed_m[peak] * 3.6),
+        "mean_speed_m_s": _round(np.mean(speed_m)),
+        "peak_speed_frame": int(valid[peak + 1]),
+        "path_length_m": _round(step.sum() / px_per_m),
+    })
+
+    # ---- ORIENTATION ----
+    # PCA axis angles are only defined mod 180: unwrap on the doubled angle
+    a_valid = np.flatnonzero(np.isfinite(angle))
+    if a_valid.size >= 2:
+        theta = np.unwrap(np.radians(angle[a_valid]) * 2) / 2
+        theta_deg = np.degrees(theta)
+        ang_vel = np.abs(np.diff(theta_deg)) / (np.diff(a_valid) / fps)
+        metrics["peak_angular_velocity_deg_s"] = _round(ang_vel.max())
+        metrics["swing_arc_deg"] = _round(theta_deg.max() - theta_deg.min())
+
+    return metrics
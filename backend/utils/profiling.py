@@ -0,0 +1,213 @@
+# profiling.py
+# Per-stage timing for the pipelines, aggregated into Prometheus-style
+# histograms.
+#
+# A Profile is filled where the work happens (ML worker processes, the
+# non-ML subprocess), travels back as a plain dict inside the result,
+# and is merged into the server's process-wide StageMetrics, which
+# /metrics renders in the Prometheus text format.
+
+import time
+import threading
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in seconds ("le"); +Inf is implicit
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+
+
+class Histogram:
+    """Per-bucket (non-cumulative) counts, sum, count and max"""
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, data):
+        """Add a to_dict() from another histogram (same BUCKETS)"""
+        for i, n in enumerate(data["buckets"]):
+            self.counts[i] += n
+        self.sum += data["sum"]
+        self.count += data["count"]
+        self.max = max(self.max, data["max"])
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "buckets": list(self.counts),
+        }
+
+
+class _Span:
+    __slots__ = ("profile", "stage", "t0")
+
+    def __init__(self, profile, stage):
+        self.profile = profile
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class Profile:
+    """
+    Stage timings of one job:
+
+        with profile("inference"):
+            ...
+        profile.add("decode", seconds)
+
+    Safe to fill from several threads (decode / process / write).
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, stage):
+        return _Span(self, stage)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def merge(self, data):
+        """Add another profile's to_dict() (e.g. from a worker process)"""
+        if not data:
+            return
+        with self._lock:
+            for stage, hist_data in data.items():
+                hist = self.stages.get(stage)
+                if hist is None:
+                    hist = self.stages[stage] = Histogram()
+                hist.merge(hist_data)
+
+    def to_dict(self):
+        with self._lock:
+            return {stage: h.to_dict() for stage, h in self.stages.items()}
+
+    def summary(self):
+        """Readable per-stage totals, busiest first"""
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda kv: kv[1].sum, reverse=True)
+            return {
+                stage: {
+                    "calls": h.count,
+                    "total_s": round(h.sum, 4),
+                    "mean_ms": round(1000 * h.sum / h.count, 3) if h.count else None,
+                    "max_ms": round(1000 * h.max, 3),
+                }
+                for stage, h in stages
+            }
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullProfile:
+    """Drop-in Profile that records nothing (the default for trackers)"""
+
+    _span = _NullSpan()
+
+    def __call__(self, stage):
+        return self._span
+
+    def add(self, stage, seconds):
+        pass
+
+    def merge(self, data):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class StageMetrics:
+    """Process-wide stage histograms, labelled by pipeline and stage"""
+
+    def __init__(self, name="crictrac_stage_seconds"):
+        self.name = name
+        self.hists = {}
+        self._lock = threading.Lock()
+
+    def _hist(self, pipeline, stage):
+        key = (pipeline, stage)
+        hist = self.hists.get(key)
+        if hist is None:
+            hist = self.hists[key] = Histogram()
+        return hist
+
+    def observe(self, pipeline, stage, seconds):
+        with self._lock:
+            self._hist(pipeline, stage).observe(seconds)
+
+    def merge(self, pipeline, profile):
+        """Fold in a Profile or its to_dict()"""
+        data = profile.to_dict() if isinstance(profile, Profile) else profile
+        with self._lock:
+            for stage, hist_data in (data or {}).items():
+                self._hist(pipeline, stage).merge(hist_data)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} Time spent per call of each pipeline stage",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted(self.hists.items())
+            for (pipeline, stage), hist in items:
+                labels = {"pipeline": pipeline, "stage": stage}
+                cumulative = 0
+                for le, n in zip(BUCKETS + ("+Inf",), hist.counts):
+                    cumulative += n
+                    lines.append(
+                        f'{self.name}_bucket{{{_labels(labels)},le="{le}"}} {cumulative}'
+                    )
+                lines.append(f"{self.name}_sum{{{_labels(labels)}}} {hist.sum:.6f}")
+                lines.append(f"{self.name}_count{{{_labels(labels)}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def render_gauge(name, help_text, samples, kind="gauge"):
+    """Prometheus text for a metric given as [(labels dict, value)]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if labels:
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
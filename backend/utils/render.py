@@ -0,0 +1,142 @@
+# render.py
+# Overlay drawing, and annotated video rendered from stored tracks.
+# Processing only has to produce tracks (utils.tracks .npz); the
+# annotated video is a separate step run when someone asks for it.
+
+import cv2
+import numpy as np
+
+from utils.tracks import load_tracks, MODES
+from utils.video_io import make_h264_writer, VideoSource, ThreadedVideoPipeline
+
+BOX_COLOR = (0, 255, 0)
+CENTRE_COLOR = (0, 0, 255)
+LOST_COLOR = (0, 165, 255)
+
+QUEUE_SIZE = 8
+
+
+def draw_detections(frame, boxes, confs, track_ids):
+    """ML overlay, in place: xyxy boxes labelled "Bat <id> <conf>" """
+    for box, conf, tid in zip(boxes, confs, track_ids):
+        x1, y1, x2, y2 = map(int, box)
+
+        cv2.rectangle(frame, (x1, y1), (x2, y2), BOX_COLOR, 2)
+        cv2.putText(
+            frame,
+            f"Bat {tid} {conf:.2f}",
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            BOX_COLOR,
+            2
+        )
+    return frame
+
+
+def draw_rect(frame, rect):
+    """Non-ML overlay, in place: rotated bat rect and its centre"""
+    box = cv2.boxPoints(rect).astype(int)
+    cv2.drawContours(frame, [box], 0, BOX_COLOR, 2)
+
+    (cx, cy), _, _ = rect
+    cv2.circle(frame, (int(cx), int(cy)), 3, CENTRE_COLOR, -1)
+    return frame
+
+
+def draw_lost(frame, centre):
+    """Predicted centre while the tracker has lost the bat"""
+    cv2.circle(frame, (int(centre[0]), int(centre[1])), 8, LOST_COLOR, 1)
+    return frame
+
+
+def _detection_overlay(detections):
+    detections = detections[np.argsort(detections["frame"], kind="stable")]
+    frames = detections["frame"]
+
+    def draw(idx, frame):
+        lo, hi = np.searchsorted(frames, (idx, idx + 1))
+        if lo == hi:
+            return
+        rows = detections[lo:hi]
+        boxes = np.stack(
+            [rows["x"], rows["y"], rows["x"] + rows["w"], rows["y"] + rows["h"]], axis=1
+        )
+        draw_detections(frame, boxes, rows["confidence"], rows["track_id"])
+
+    return draw
+
+
+def _frame_state_overlay(states):
+    rows = {int(f): i for i, f in enumerate(states["frame"])}
+    lost = MODES.index("LOST")
+
+    def draw(idx, frame):
+        i = rows.get(idx)
+        if i is None:
+            return
+        s = states[i]
+        if np.isfinite(s["cx"]):
+            draw_rect(frame, ((float(s["cx"]), float(s["cy"])),
+                              (float(s["w"]), float(s["h"])), float(s["rect_angle"])))
+        elif s["mode"] == lost and np.isfinite(s["smooth_x"]):
+            draw_lost(frame, (s["smooth_x"], s["smooth_y"]))
+
+    return draw
+
+
+def render_tracks(video_path, tracks_path, output_path, encode_preset="fast",
+                  progress_callback=None, profile=None):
+    """
+    Draw stored tracks onto the source video and encode it: ML
+    detections as labelled boxes, non-ML frame states as rotated rects.
+    Tracks of a segmented session (a "shots" array) render only the
+    shot windows, back to back, like the in-pass video.
+    """
+    tracks = load_tracks(tracks_path)
+    if "detections" in tracks:
+        draw = _detection_overlay(tracks["detections"])
+    else:
+        draw = _frame_state_overlay(tracks["frames"])
+
+    # Frames are drawn on in place and handed to the writer, so the ring
+    # covers both queues plus one frame in each stage
+    windows = [(int(a), int(b)) for a, b in tracks["shots"]] if "shots" in tracks else [(0, None)]
+    if not windows:
+        raise RuntimeError("No shots to render")
+    sources = [VideoSource(video_path, a, b, buffers=2 * QUEUE_SIZE + 3) for a, b in windows]
+    first = sources[0]
+    total_frames = sum(v.frame_count for v in sources)
+
+    out = make_h264_writer(output_path, first.fps, first.width, first.height,
+                           preset=encode_preset)
+    done = 0
+    stats = []
+
+    try:
+        for (start, _), video in zip(windows, sources):
+            frame_idx = start
+
+            def process(frame):
+                nonlocal frame_idx, done
+                draw(frame_idx, frame)
+                frame_idx += 1
+                done += 1
+                if progress_callback is not None:
+                    progress_callback(done, total_frames)
+                return frame
+
+            pipeline = ThreadedVideoPipeline(video, process, out.write,
+                                             queue_size=QUEUE_SIZE, profile=profile)
+            try:
+                stats.append(pipeline.run())
+            finally:
+                video.close()
+    finally:
+        out.release()
+
+    return {
+        "output_video": str(output_path),
+        "total_frames": done,
+        "stages": stats[0] if len(stats) == 1 else stats
+    }
@@ -0,0 +1,166 @@
+# shots.py
+# Shot segmentation for net-session uploads: most of a session is idle
+# time between deliveries, so a cheap first pass over a small, strided
+# decode finds the high-motion windows and only those are tracked.
+#
+# Motion energy is BatTracker's fast-motion test (absdiff > 25 between
+# frames) as the share of pixels that pass it, per sampled frame.
+
+import cv2
+import numpy as np
+
+from utils.video_io import VideoSource, probe_video
+from utils.metrics import compute_swing_metrics
+
+MOTION_HEIGHT = 180     # px, decode height of the energy pass
+MOTION_FPS = 10         # sampled frames per second of video
+DIFF_THRESHOLD = 25     # same as BatTracker's frame-diff threshold
+
+# A sample is active above max(MIN_ENERGY, median + NOISE_K * sigma),
+# sigma estimated from the MAD, so sensor noise and a swaying
+# background set their own floor
+MIN_ENERGY = 0.002
+NOISE_K = 6.0
+
+MIN_ACTIVE_S = 0.2      # shorter bursts (a bird, a flicker) are dropped
+PAD_S = 0.75            # context kept before and after each burst
+MERGE_GAP_S = 1.0       # bursts closer than this are one shot
+
+# Shorter videos are a single shot already; segmenting them only risks
+# cutting the swing
+MIN_SESSION_S = 20.0
+
+
+def motion_energy(video_path, height=MOTION_HEIGHT, sample_fps=MOTION_FPS):
+    """
+    (frames, energy, stride, fps): for every sampled frame after the
+    first, its absolute frame number and the share of pixels that moved
+    since the previous sample.
+    """
+    info = probe_video(video_path)
+    if info is None:
+        raise RuntimeError(f"Cannot open video {video_path}")
+    fps = info["fps"] if info["fps"] > 0 else 30.0
+    stride = max(1, int(round(fps / sample_fps)))
+
+    frames, energy = [], []
+    prev = None
+    with VideoSource(video_path, stride=stride, max_height=height, buffers=2) as video:
+        for i, frame in enumerate(video):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if prev is not None:
+                diff = cv2.absdiff(prev, gray)
+                _, moving = cv2.threshold(diff, DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+                frames.append(i * stride)
+                energy.append(cv2.countNonZero(moving) / moving.size)
+            prev = gray
+
+    return np.array(frames, dtype=np.int64), np.array(energy), stride, fps
+
+
+def find_shots(frames, energy, stride, fps, total_frames):
+    """
+    Shot windows [start, end) from a motion_energy series: runs of
+    active samples, padded, merged when close, as chunk-like dicts
+    (see utils.chunking.plan_chunks) that also carry peak_energy.
+    """
+    if not len(energy):
+        return []
+
+    median = np.median(energy)
+    sigma = 1.4826 * np.median(np.abs(energy - median))
+    threshold = max(MIN_ENERGY, median + NOISE_K * sigma)
+
+    edges = np.diff(np.concatenate(([0], (energy > threshold).astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)      # exclusive sample index
+
+    keep = (ends - starts) * stride >= MIN_ACTIVE_S * fps
+    starts, ends = starts[keep], ends[keep]
+
+    pad = int(round(PAD_S * fps))
+    gap = int(round(MERGE_GAP_S * fps))
+    if total_frames <= 0:
+        total_frames = int(frames[-1]) + stride
+
+    shots = []
+    for s, e in zip(starts, ends):
+        # A sample's diff covers the stride frames before it
+        lo = max(0, int(frames[s]) - stride - pad)
+        hi = min(total_frames, int(frames[e - 1]) + 1 + pad)
+        peak = float(energy[s:e].max())
+        if shots and lo - shots[-1]["end"] <= gap:
+            shots[-1]["end"] = max(shots[-1]["end"], hi)
+            shots[-1]["peak_energy"] = max(shots[-1]["peak_energy"], peak)
+            continue
+        shots.append({"start": lo, "end": hi, "warmup": 0, "peak_energy": peak})
+
+    for i, shot in enumerate(shots):
+        shot["index"] = i
+        shot["peak_energy"] = round(shot["peak_energy"], 4)
+    return shots
+
+
+def segment_shots(video_path, min_session_s=MIN_SESSION_S):
+    """
+    Shot windows of a session video, or None when the video is too
+    short to be worth segmenting (process it whole).
+    """
+    info = probe_video(video_path)
+    if info is None:
+        raise RuntimeError(f"Cannot open video {video_path}")
+    fps = info["fps"] if info["fps"] > 0 else 30.0
+    if info["frame_count"] < min_session_s * fps:
+        return None
+
+    frames, energy, stride, fps = motion_energy(video_path)
+    return find_shots(frames, energy, stride, fps, info["frame_count"])
+
+
+def shot_summary(shot, trajectory, fps):
+    """
+    Per-shot result: the window (also in seconds) and swing metrics of
+    a trajectory that starts at the shot's first frame.
+    """
+    metrics = compute_swing_metrics(trajectory, fps)
+    if metrics["peak_speed_frame"] is not None:
+        metrics["peak_speed_frame"] += shot["start"]
+
+    fps = float(fps) if fps and fps > 0 else 30.0
+    return {
+        "index": shot["index"],
+        "start": shot["start"],
+        "end": shot["end"],
+        "start_s": round(shot["start"] / fps, 3),
+        "end_s": round(shot["end"] / fps, 3),
+        "peak_energy": shot.get("peak_energy"),
+        "metrics": metrics,
+    }
+
+
+def whole_video_shot(total_frames, fps, metrics):
+    """The single shot of an unsegmented video, given its metrics"""
+    fps = float(fps) if fps and fps > 0 else 30.0
+    return {
+        "index": 0,
+        "start": 0,
+        "end": total_frames,
+        "start_s": 0.0,
+        "end_s": round(total_frames / fps, 3),
+        "metrics": metrics,
+    }
+
+
+def best_shot(shots):
+    """Index of the shot with the fastest bat (same camera: px/s compare), or None"""
+    best, best_speed = None, -1.0
+    for shot in shots:
+        speed = shot["metrics"]["peak_speed_px_s"]
+        if speed is not None and speed > best_speed:
+            best, best_speed = shot["index"], speed
+    return best
+
+
+def shots_array(shots):
+    """(n, 2) int64 [start, end) frame windows, as stored in tracks .npz"""
+    return np.array([[s["start"], s["end"]] for s in shots], dtype=np.int64).reshape(-1, 2)
@@ -0,0 +1,150 @@
+# tracks.py
+# Columnar storage for detections and per-frame tracker state.
+# Rows live in NumPy structured arrays and are saved as one .npz next
+# to the output video, instead of a Python dict per detection.
+
+import os
+import numpy as np
+
+# One row per ML detection; bbox is x, y, w, h in pixels
+DETECTION_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("track_id", "<i4"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("w", "<f4"),
+    ("h", "<f4"),
+    ("confidence", "<f4"),
+])
+
+# Non-ML tracker modes, stored by index in FRAME_STATE_DTYPE["mode"]
+MODES = ("IDLE", "DETECT", "TRACK", "LOST")
+
+# One row per non-ML frame; NaN where the bat was not found
+FRAME_STATE_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("mode", "i1"),
+    ("cx", "<f4"),
+    ("cy", "<f4"),
+    ("w", "<f4"),
+    ("h", "<f4"),
+    ("rect_angle", "<f4"),
+    ("angle", "<f4"),
+    ("smooth_x", "<f4"),
+    ("smooth_y", "<f4"),
+    ("confidence", "<f4"),
+])
+
+# Per-frame trajectory (utils.metrics) columns
+TRAJECTORY_DTYPE = np.dtype([
+    ("cx", "<f4"),
+    ("cy", "<f4"),
+    ("angle", "<f4"),
+    ("length", "<f4"),
+])
+
+
+class ColumnBuffer:
+    """Append-only structured array that grows by doubling"""
+
+    def __init__(self, dtype, capacity=1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def extend(self, **columns):
+        """Append rows given as columns; scalars are broadcast"""
+        n = max(np.size(v) for v in columns.values())
+        if n == 0:
+            return
+
+        need = self._n + n
+        if need > len(self._data):
+            grown = np.empty(max(need, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._n] = self._data[:self._n]
+            self._data = grown
+
+        rows = self._data[self._n:need]
+        for name, values in columns.items():
+            rows[name] = values
+        self._n = need
+
+    def array(self):
+        return self._data[:self._n]
+
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def records_to_frame_states(records):
+    """Non-ML per-frame records (pipeline_non_ml.result_to_record) as rows"""
+    states = np.zeros(len(records), dtype=FRAME_STATE_DTYPE)
+    for name in FRAME_STATE_DTYPE.names[2:]:
+        states[name] = np.nan
+    if not records:
+        return states
+
+    states["frame"] = [r["frame"] for r in records]
+    states["mode"] = [MODES.index(r["mode"]) if r["mode"] in MODES else -1 for r in records]
+    states["confidence"] = [r.get("confidence") or 0.0 for r in records]
+
+    found = [i for i, r in enumerate(records) if r.get("rect") is not None]
+    if found:
+        rects = [records[i]["rect"] for i in found]
+        states["cx"][found] = [r[0][0] for r in rects]
+        states["cy"][found] = [r[0][1] for r in rects]
+        states["w"][found] = [r[1][0] for r in rects]
+        states["h"][found] = [r[1][1] for r in rects]
+        states["rect_angle"][found] = [r[2] for r in rects]
+
+    for i, r in enumerate(records):
+        if r.get("angle") is not None:
+            states["angle"][i] = r["angle"]
+        if r.get("smoothed") is not None:
+            states["smooth_x"][i], states["smooth_y"][i] = r["smoothed"]
+    return states
+
+
+def trajectory_to_array(traj):
+    out = np.empty(len(traj["cx"]), dtype=TRAJECTORY_DTYPE)
+    for name in TRAJECTORY_DTYPE.names:
+        out[name] = traj[name]
+    return out
+
+
+def save_tracks(path, fps, **arrays):
+    """
+    Write structured arrays to one compressed .npz (written to a temp
+    file first so readers never see a partial one).
+    """
+    path = str(path)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, fps=np.float32(fps), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_tracks(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def to_columns(tracks):
+    """JSON-friendly {array: {column: list}} (NaN becomes None)"""
+    out = {}
+    for name, arr in tracks.items():
+        if arr.dtype.names is None:
+            out[name] = arr.tolist()
+            continue
+        cols = {}
+        for col in arr.dtype.names:
+            values = arr[col]
+            if values.dtype.kind == "f":
+                values = np.where(np.isfinite(values), values.astype(object), None)
+            cols[col] = values.tolist()
+        out[name] = cols
+    return out
@@ -2,16 +2,217 @@
 # Place at: backend/utils/video_io.py
 
 import cv2
-import sys
+import os
+import time
+import queue
+import shutil
+import threading
+import subprocess
+import tempfile
+import numpy as np
+
+# x264 presets accepted by make_h264_writer
+H264_PRESETS = (
+    "ultrafast", "superfast", "veryfast", "faster", "fast",
+    "medium", "slow", "slower", "veryslow",
+)
 
 def open_video(path):
     """Open video file and return capture object"""
-    cap = cv2.VideoCapture(path)
+    cap = cv2.VideoCapture(str(path))
     if not cap.isOpened():
-        print(f"Error: Cannot open video {path}")
-        sys.exit(1)
+        raise RuntimeError(f"Cannot open video {path}")
     return cap
 
+def probe_video(path):
+    """Read container properties without decoding frames"""
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        return None
+    info = {
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+    }
+    cap.release()
+    return info
+
+def decode_size(width, height, max_height=None):
+    """(width, height) after downscaling to max_height, kept even for yuv420p"""
+    if not max_height or height <= max_height:
+        return width, height
+    scale = max_height / height
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(max_height) // 2 * 2)
+
+
+class FrameRing:
+    """
+    `size` preallocated frames handed out in turn. A frame is reused
+    (overwritten) `size` frames later, so callers must not hold more
+    than size - 1 frames at once.
+    """
+
+    def __init__(self, size, height, width):
+        self.frames = np.empty((size, height, width, 3), np.uint8)
+        self.i = 0
+
+    def next(self):
+        frame = self.frames[self.i]
+        self.i = (self.i + 1) % len(self.frames)
+        return frame
+
+
+class VideoSource:
+    """
+    Decoder for frames [start_frame, end_frame), every `stride`-th one,
+    downscaled to at most `max_height` px tall.
+
+    With ffmpeg on PATH the seek, stride and scaling happen inside
+    ffmpeg (input seek, select/scale filters) and raw BGR frames come
+    through a pipe, so skipped frames never reach Python and large
+    frames are never converted at full size. Otherwise OpenCV decodes,
+    grab() skips strided frames and cv2.resize downscales.
+
+    buffers=N reads into a FrameRing of N frames instead of allocating
+    one per frame (see FrameRing for how long each stays valid).
+
+    `scale` is decoded / source size: divide decoded coordinates by it
+    to get source pixels. Raises RuntimeError if the video can't be read.
+    """
+
+    def __init__(self, path, start_frame=0, end_frame=None, stride=1,
+                 max_height=None, buffers=None, use_ffmpeg=None):
+        self.path = str(path)
+        info = probe_video(self.path)
+        if info is None:
+            raise RuntimeError(f"Cannot open video {path}")
+
+        self.fps = info["fps"] if info["fps"] > 0 else 30.0
+        self.source_width = info["width"]
+        self.source_height = info["height"]
+        self.width, self.height = decode_size(info["width"], info["height"], max_height)
+        self.scale = self.height / self.source_height if self.source_height else 1.0
+
+        self.start_frame = max(0, start_frame)
+        self.stride = max(1, int(stride))
+        self.end_frame = info["frame_count"] if end_frame is None else end_frame
+        span = max(0, self.end_frame - self.start_frame)
+        # frames that will be yielded (fewer if the container count is off)
+        self.frame_count = -(-span // self.stride)
+        self._bounded = end_frame is not None
+
+        self.ring = FrameRing(buffers, self.height, self.width) if buffers else None
+        if use_ffmpeg is None:
+            use_ffmpeg = shutil.which("ffmpeg") is not None
+        self.use_ffmpeg = use_ffmpeg
+        self.proc = None
+        self.cap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __iter__(self):
+        if self.use_ffmpeg:
+            return self._ffmpeg_frames()
+        return self._opencv_frames()
+
+    def _out(self):
+        return self.ring.next() if self.ring is not None else None
+
+    def _ffmpeg_frames(self):
+        filters = []
+        if self.stride > 1:
+            filters.append(f"select=not(mod(n\\,{self.stride}))")
+        # Always pin the size, so every frame is exactly frame_bytes
+        filters.append(f"scale={self.width}:{self.height}:flags=area")
+
+        cmd = ["ffmpeg", "-loglevel", "error", "-nostdin"]
+        if self.start_frame > 0:
+            # Input seek: jumps to the keyframe before, decodes up to the start
+            cmd += ["-ss", f"{self.start_frame / self.fps:.6f}"]
+        cmd += ["-i", self.path, "-an", "-sn", "-vf", ",".join(filters),
+                "-vsync", "passthrough"]
+        if self._bounded:
+            cmd += ["-frames:v", str(self.frame_count)]
+        cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+
+        log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                     stderr=log, stdin=subprocess.DEVNULL)
+        shape = (self.height, self.width, 3)
+        frame_bytes = self.height * self.width * 3
+        try:
+            while True:
+                frame = self._out()
+                if frame is None:
+                    frame = np.empty(shape, np.uint8)
+                if _read_exact(self.proc.stdout, memoryview(frame).cast("B")) < frame_bytes:
+                    break
+                yield frame
+
+            if self.proc.wait() != 0:
+                log.seek(0)
+                raise RuntimeError(
+                    f"ffmpeg decode failed: {log.read().decode(errors='replace')}"
+                )
+        finally:
+            self.close()
+            log.close()
+
+    def _opencv_frames(self):
+        self.cap = open_video(self.path)
+        if self.start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        resize = (self.width, self.height) != (self.source_width, self.source_height)
+        count = 0
+        try:
+            while not self._bounded or count < self.frame_count:
+                # grab() decodes without the BGR conversion of read()
+                if count > 0 and not all(self.cap.grab() for _ in range(self.stride - 1)):
+                    return
+                out = self._out()
+                if resize or out is None:
+                    ret, frame = self.cap.read()
+                    if ret and resize:
+                        frame = cv2.resize(frame, (self.width, self.height), dst=out,
+                                           interpolation=cv2.INTER_AREA)
+                else:
+                    ret, frame = self.cap.read(out)
+                if not ret:
+                    return
+                count += 1
+                yield frame
+        finally:
+            self.close()
+
+    def close(self):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                # stopped early: don't wait for ffmpeg to decode the rest
+                self.proc.kill()
+            self.proc.stdout.close()
+            self.proc.wait()
+            self.proc = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def _read_exact(stream, view):
+    """readinto until view is full or EOF; bytes read"""
+    got = 0
+    while got < len(view):
+        n = stream.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    return got
+
 def make_writer(path, fps, width, height):
     """Create video writer"""
     if path is None:
@@ -23,6 +224,310 @@ def make_writer(path, fps, width, height):
         return None
     return writer
 
+class FFmpegWriter:
+    """
+    Streams raw BGR frames into an ffmpeg stdin pipe, encoding once
+    to H.264/yuv420p with no intermediate file.
+    Same write()/release() interface as cv2.VideoWriter.
+    """
+
+    def __init__(self, path, fps, width, height, preset="fast", crf=23):
+        self.path = str(path)
+        self.frame_bytes = width * height * 3
+        self._log = tempfile.TemporaryFile()
+
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",
+            "-an",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            self.path,
+        ]
+        self.proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL, stderr=self._log
+        )
+
+    def isOpened(self):
+        return self.proc.poll() is None
+
+    def write(self, frame):
+        if frame.nbytes != self.frame_bytes:
+            raise ValueError("Frame size does not match writer size")
+        try:
+            self.proc.stdin.write(frame.data if frame.flags.c_contiguous
+                                  else frame.tobytes())
+        except BrokenPipeError:
+            self.release()
+
+    def release(self):
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        code = self.proc.wait()
+        if code != 0:
+            self._log.seek(0)
+            err = self._log.read().decode(errors="replace")
+            self._log.close()
+            raise RuntimeError(f"ffmpeg encode failed: {err}")
+        self._log.close()
+
+
+def make_h264_writer(path, fps, width, height, preset="fast", crf=23):
+    """
+    Create a browser-playable H.264 writer.
+    Prefers an ffmpeg pipe; falls back to OpenCV's own encoders.
+    """
+    if preset not in H264_PRESETS:
+        raise ValueError(f"Unknown preset {preset!r}")
+
+    if shutil.which("ffmpeg"):
+        writer = FFmpegWriter(path, fps, width, height, preset, crf)
+        if writer.isOpened():
+            return writer
+        print("Warning: ffmpeg pipe failed to start, falling back to OpenCV")
+
+    for codec in ("avc1", "mp4v"):
+        writer = cv2.VideoWriter(
+            str(path), cv2.VideoWriter_fourcc(*codec), fps, (width, height)
+        )
+        if writer.isOpened():
+            if codec != "avc1":
+                print(f"Warning: H.264 unavailable, wrote {codec} to {path}")
+            return writer
+
+    raise RuntimeError(f"Cannot create output video {path}")
+
+def concat_videos(parts, output_path, encode_preset="fast"):
+    """
+    Join videos encoded with identical settings, in order.
+    Uses ffmpeg's concat demuxer (stream copy, no re-encode) when
+    available, otherwise decodes and re-encodes with OpenCV.
+    """
+    output_path = str(output_path)
+
+    if shutil.which("ffmpeg"):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as lst:
+            for p in parts:
+                lst.write(f"file '{p}'\n")
+        try:
+            proc = subprocess.run([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", lst.name,
+                "-c", "copy", "-movflags", "+faststart",
+                output_path
+            ], capture_output=True, text=True)
+        finally:
+            os.remove(lst.name)
+        if proc.returncode == 0:
+            return
+        print(f"Warning: ffmpeg concat failed, re-encoding: {proc.stderr}")
+
+    writer = None
+    for p in parts:
+        cap = cv2.VideoCapture(str(p))
+        if writer is None:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            writer = make_h264_writer(output_path, fps, width, height, encode_preset)
+        for frame in read_frames(cap):
+            writer.write(frame)
+        cap.release()
+    if writer is not None:
+        writer.release()
+
 def show_frame(window_name, frame):
     """Display frame in named window"""
-    cv2.imshow(window_name, frame)
\ No newline at end of file
+    cv2.imshow(window_name, frame)
+
+# ==========================================================
+#   THREADED DECODE -> PROCESS -> WRITE
+# ==========================================================
+def read_frames(cap, max_frames=None):
+    """Yield frames from an open capture until it runs out (or max_frames)"""
+    count = 0
+    while max_frames is None or count < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        count += 1
+        yield frame
+
+def batched(frames, batch_size):
+    """Group any frame iterable (e.g. a VideoSource) into lists of batch_size"""
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_s = 0.0   # time spent doing the stage's own work
+        self.wait_s = 0.0   # time blocked on the neighbouring queues
+
+    def to_dict(self):
+        return {
+            "items": self.items,
+            "busy_s": round(self.busy_s, 4),
+            "wait_s": round(self.wait_s, 4),
+            # what the stage could sustain on its own
+            "items_per_s": round(self.items / self.busy_s, 2) if self.busy_s > 0 else None,
+        }
+
+
+class ThreadedVideoPipeline:
+    """
+    Three stages with bounded queues between them:
+
+        decoder thread  ->  process (caller's thread)  ->  writer thread
+
+    OpenCV releases the GIL while decoding/encoding, so those overlap
+    with processing. Full queues block the faster stage (backpressure).
+
+    With a utils.profiling.Profile, every decoded and written item is
+    also recorded as a "decode" / "encode" stage call.
+    """
+
+    _DONE = object()
+
+    def __init__(self, source, process, write=None, queue_size=8, profile=None):
+        self.source = source
+        self.profile = profile
+        self.process = process
+        self.write = write
+        self.in_q = queue.Queue(maxsize=queue_size)
+        self.out_q = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+        self.stats = {
+            "decode": StageStats("decode"),
+            "process": StageStats("process"),
+            "write": StageStats("write"),
+        }
+        self.wall_s = 0.0
+
+    def _put(self, q, item, stats):
+        t0 = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.wait_s += time.perf_counter() - t0
+
+    def _get(self, q, stats):
+        t0 = time.perf_counter()
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self.stop.is_set():
+                    item = self._DONE
+                    break
+        stats.wait_s += time.perf_counter() - t0
+        return item
+
+    def _decode_loop(self):
+        st = self.stats["decode"]
+        it = iter(self.source)
+        try:
+            while not self.stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                dt = time.perf_counter() - t0
+                st.busy_s += dt
+                st.items += 1
+                if self.profile is not None:
+                    self.profile.add("decode", dt)
+                self._put(self.in_q, item, st)
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            self._put(self.in_q, self._DONE, st)
+
+    def _write_loop(self):
+        st = self.stats["write"]
+        try:
+            while True:
+                item = self._get(self.out_q, st)
+                if item is self._DONE:
+                    break
+                t0 = time.perf_counter()
+                self.write(item)
+                dt = time.perf_counter() - t0
+                st.busy_s += dt
+                st.items += 1
+                if self.profile is not None:
+                    self.profile.add("encode", dt)
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+
+    def run(self):
+        """Run to completion; re-raises the first error from any stage"""
+        start = time.perf_counter()
+        st = self.stats["process"]
+
+        decoder = threading.Thread(target=self._decode_loop, daemon=True)
+        decoder.start()
+        writer = None
+        if self.write is not None:
+            writer = threading.Thread(target=self._write_loop, daemon=True)
+            writer.start()
+
+        try:
+            while True:
+                item = self._get(self.in_q, st)
+                if item is self._DONE or self.stop.is_set():
+                    break
+                t0 = time.perf_counter()
+                out = self.process(item)
+                st.busy_s += time.perf_counter() - t0
+                st.items += 1
+                if writer is not None and out is not None:
+                    self._put(self.out_q, out, st)
+        except BaseException:
+            self.stop.set()
+            raise
+        finally:
+            if writer is not None:
+                self._put(self.out_q, self._DONE, st)
+                writer.join()
+            self.stop.set()
+            decoder.join()
+            self.wall_s = time.perf_counter() - start
+
+        if self.errors:
+            raise self.errors[0]
+        return self.stats_dict()
+
+    def stats_dict(self):
+        stages = {name: s.to_dict() for name, s in self.stats.items()}
+        busy = {name: s.busy_s for name, s in self.stats.items() if s.items}
+        return {
+            "wall_s": round(self.wall_s, 4),
+            "stages": stages,
+            "bottleneck": max(busy, key=busy.get) if busy else None,
+        }
@@ -15,6 +15,7 @@ import {
 export default function CricTrac() {
   const [file, setFile] = useState(null);
   const [processing, setProcessing] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [result, setResult] = useState(null);
   const [error, setError] = useState(null);
   const [mode, setMode] = useState("ml");
@@ -26,6 +27,12 @@ export default function CricTrac() {
   const [recording, setRecording] = useState(false);
   const recordedChunks = useRef([]);
 
+  // Live tracking states
+  const [live, setLive] = useState(null);
+  const liveSocket = useRef(null);
+  const videoRef = useRef(null);
+  const overlayRef = useRef(null);
+
   /* ---------------- Drag & Drop ---------------- */
   const handleDrag = (e) => {
     e.preventDefault();
@@ -114,6 +121,7 @@ export default function CricTrac() {
   };
 
   const stopWebcam = () => {
+    stopLive();
     if (stream) {
       stream.getTracks().forEach((t) => t.stop());
       setStream(null);
@@ -122,6 +130,81 @@ export default function CricTrac() {
     }
   };
 
+  /* ---------------- Live Tracking ---------------- */
+  const drawOverlay = (msg) => {
+    const canvas = overlayRef.current;
+    const video = videoRef.current;
+    if (!canvas || !video) return;
+    canvas.width = video.videoWidth;
+    canvas.height = video.videoHeight;
+    const ctx = canvas.getContext("2d");
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.lineWidth = 3;
+    ctx.strokeStyle = "#00ff00";
+
+    // Non-ML box is [x, y, w, h]
+    if (msg.box) ctx.strokeRect(...msg.box);
+    (msg.detections || []).forEach((d) => ctx.strokeRect(...d.bbox));
+  };
+
+  const startLive = () => {
+    const video = videoRef.current;
+    if (!video) return;
+
+    const ws = new WebSocket(`ws://localhost:8000/ws/track/${mode}`);
+    const capture = document.createElement("canvas");
+
+    // One frame in flight: the next is captured when the answer arrives
+    const sendFrame = () => {
+      if (ws.readyState !== WebSocket.OPEN || !video.videoWidth) return;
+      capture.width = video.videoWidth;
+      capture.height = video.videoHeight;
+      capture.getContext("2d").drawImage(video, 0, 0);
+      capture.toBlob((blob) => blob && ws.send(blob), "image/jpeg", 0.7);
+    };
+
+    ws.onmessage = (e) => {
+      const msg = JSON.parse(e.data);
+      if (msg.type === "result") {
+        drawOverlay(msg);
+        setLive({
+          state: msg.mode || `${msg.detections.length} detections`,
+          latency: msg.latency_ms,
+          dropped: msg.dropped,
+        });
+      }
+      requestAnimationFrame(sendFrame);
+    };
+    ws.onerror = () => setError("Live tracking connection failed");
+    ws.onclose = () => {
+      liveSocket.current = null;
+      setLive(null);
+    };
+
+    liveSocket.current = ws;
+    setLive({ state: "Connecting...", latency: null, dropped: 0 });
+    setError(null);
+  };
+
+  const stopLive = () => {
+    if (liveSocket.current) liveSocket.current.close();
+    const canvas = overlayRef.current;
+    if (canvas) canvas.getContext("2d").clearRect(0, 0, canvas.width, canvas.height);
+  };
+
+  /* ---------------- Job Polling ---------------- */
+  const waitForJob = async (statusUrl) => {
+    while (true) {
+      const res = await fetch(`http://localhost:8000${statusUrl}`);
+      const job = await res.json();
+      if (!res.ok) throw new Error(job.detail || "Processing failed");
+      if (job.state === "done") return job.result;
+      if (job.state === "failed") throw new Error(job.error || "Processing failed");
+      setProgress(job.progress);
+      await new Promise((r) => setTimeout(r, 1000));
+    }
+  };
+
   /* ---------------- Upload ---------------- */
   const handleUpload = async () => {
     if (!file) {
@@ -133,18 +216,20 @@ export default function CricTrac() {
     formData.append("video", file);
 
     setProcessing(true);
+    setProgress(null);
     setError(null);
     setResult(null);
 
     try {
-      const res = await fetch(`http://localhost:8000/track/${mode}`, {
+      // The page shows the annotated video, so draw it in the same pass
+      const res = await fetch(`http://localhost:8000/track/${mode}?render=1`, {
         method: "POST",
         body: formData,
       });
 
       const data = await res.json();
       if (!res.ok) throw new Error(data.detail || "Processing failed");
-      setResult(data);
+      setResult(await waitForJob(data.status_url));
     } catch (err) {
       setError(err.message);
     } finally {
@@ -184,13 +269,27 @@ export default function CricTrac() {
 
         {/* Webcam Preview */}
         {stream && (
-          <video
-            autoPlay
-            muted
-            playsInline
-            className="webcam-preview"
-            ref={(v) => v && (v.srcObject = stream)}
-          />
+          <div className="webcam-wrapper">
+            <video
+              autoPlay
+              muted
+              playsInline
+              className="webcam-preview"
+              ref={(v) => {
+                videoRef.current = v;
+                if (v) v.srcObject = stream;
+              }}
+            />
+            <canvas ref={overlayRef} className="webcam-overlay" />
+          </div>
+        )}
+
+        {live && (
+          <div className="live-status">
+            {live.state}
+            {live.latency != null && ` · ${Math.round(live.latency)} ms`}
+            {` · ${live.dropped} dropped`}
+          </div>
         )}
 
         {/* Webcam Controls */}
@@ -200,7 +299,17 @@ export default function CricTrac() {
               <Camera /> Open Webcam
             </button>
           )}
-          {stream && !recording && (
+          {stream && !recording && !live && (
+            <button onClick={startLive} className="process-btn">
+              <Activity /> Live Track
+            </button>
+          )}
+          {live && (
+            <button onClick={stopLive} className="process-btn process-btn-nonml">
+              <StopCircle /> Stop Live
+            </button>
+          )}
+          {stream && !recording && !live && (
             <button
               onClick={startRecording}
               className="process-btn process-btn-ml"
@@ -245,7 +354,11 @@ export default function CricTrac() {
           disabled={!file || processing}
           className="process-btn"
         >
-          {processing ? "Processing..." : "Start Tracking"}
+          {processing
+            ? progress != null
+              ? `Processing... ${Math.round(progress * 100)}%`
+              : "Processing..."
+            : "Start Tracking"}
         </button>
 
         {/* Error */}
@@ -256,7 +369,7 @@ export default function CricTrac() {
         )}
 
         {/* Result */}
-        {result && (
+        {result?.output_video && (
           <div className="result-container">
             <video
               controls